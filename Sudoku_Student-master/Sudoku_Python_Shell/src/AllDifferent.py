@@ -0,0 +1,180 @@
+import Variable
+
+"""
+    Generalized arc consistency for the all-different constraint of one
+    unit (Regin's algorithm).
+
+    A value can stay in a variable's domain only if some maximum matching
+    of variables to values uses that pair. A maximum matching is found by
+    augmenting paths, starting from the matching of the previous call with
+    the pairs that are no longer possible dropped, so a small change to the
+    domains only costs a few augmentations. If some variable stays
+    unmatched the constraint fails. Otherwise, with matched pairs directed
+    variable -> value and the other pairs value -> variable, a pair outside
+    the matching belongs to another maximum matching iff both ends are in
+    the same strongly connected component or the value can be reached from
+    a value no variable is matched to.
+"""
+
+class AllDifferent:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, constraint ):
+        self.constraint = constraint
+        self.vars = list( constraint.vars )
+
+        # variable -> matched value and value -> matched variable
+        self.match = dict()
+        self.matchedBy = dict()
+
+        # Variable.versionCounter when the constraint was last made GAC
+        self.stamp = -1
+
+    # ==================================================================
+    # Matching
+    # ==================================================================
+
+    # Tries to match x through an augmenting path, visited holds seen values
+    def augment ( self, x, visited ):
+        for value in x.domain.values:
+            if value in visited:
+                continue
+            visited.add( value )
+            y = self.matchedBy.get( value )
+            if y == None or self.augment( y, visited ):
+                self.match[x] = value
+                self.matchedBy[value] = x
+                return True
+        return False
+
+    # Returns True if every variable could be matched to a distinct value
+    def findMatching ( self ):
+        for x in self.vars:
+            value = self.match.get( x )
+            if value != None and not x.domain.contains( value ):
+                del self.match[x]
+                del self.matchedBy[value]
+
+        for x in self.vars:
+            if x not in self.match and not self.augment( x, set() ):
+                return False
+        return True
+
+    # ==================================================================
+    # Pruning
+    # ==================================================================
+
+    # Returns the strongly connected component of every node of a graph given
+    # as adjacency lists over 0..n-1 (Tarjan, iterative)
+    def components ( self, edges ):
+        n = len(edges)
+        index = [ -1 ] * n
+        low = [ 0 ] * n
+        component = [ -1 ] * n
+        onStack = [ False ] * n
+        stack = []
+        counter = 0
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append( root )
+            onStack[root] = True
+            work = [ ( root, 0 ) ]
+
+            while work:
+                node, i = work[-1]
+                children = edges[node]
+                while i < len(children):
+                    child = children[i]
+                    i += 1
+                    if index[child] == -1:
+                        break
+                    if onStack[child] and index[child] < low[node]:
+                        low[node] = index[child]
+                else:
+                    child = None
+
+                if child != None and index[child] == -1:
+                    work[-1] = ( node, i )
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append( child )
+                    onStack[child] = True
+                    work.append( ( child, 0 ) )
+                    continue
+
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        onStack[member] = False
+                        component[member] = node
+                        if member == node:
+                            break
+        return component
+
+    """
+        Makes the constraint generalized arc consistent, pushing every
+        variable on the trail before its domain is changed.
+
+        Variables with a single value are taken out first, their values
+        removed from the others, so the graph only holds the open part.
+
+        Return: a tuple (number of values removed, consistent)
+    """
+    def propagate ( self, trail ):
+        if not self.findMatching():
+            return ( 0, False )
+
+        fixed = set( x.domain.values[0] for x in self.vars if x.size() == 1 )
+        openVars = [ x for x in self.vars if x.size() > 1 ]
+
+        # Nodes are the open variables 0..k-1, then their values
+        k = len(openVars)
+        valueNode = dict()
+        for x in openVars:
+            for value in x.domain.values:
+                if value not in fixed and value not in valueNode:
+                    valueNode[value] = k + len(valueNode)
+
+        # Matched pairs run variable -> value, the others value -> variable
+        edges = [ [] for i in range( k + len(valueNode) ) ]
+        for i, x in enumerate(openVars):
+            matched = self.match[x]
+            edges[i].append( valueNode[matched] )
+            for value in x.domain.values:
+                if value != matched and value not in fixed:
+                    edges[valueNode[value]].append( i )
+
+        # Values reachable from an unmatched value keep all their pairs
+        free = [ False ] * len(edges)
+        work = [ node for value, node in valueNode.items() if value not in self.matchedBy ]
+        while work:
+            node = work.pop()
+            if not free[node]:
+                free[node] = True
+                work.extend( edges[node] )
+
+        component = self.components( edges )
+        removed = 0
+        for i, x in enumerate(openVars):
+            matched = self.match[x]
+            doomed = [ value for value in x.domain.values
+                       if value in fixed or ( value != matched and not free[valueNode[value]]
+                                              and component[i] != component[valueNode[value]] ) ]
+            if doomed:
+                trail.push( x )
+                for value in doomed:
+                    x.removeValueFromDomain( value )
+                removed += len(doomed)
+
+        self.stamp = Variable.Variable.versionCounter
+        return ( removed, True )
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import queue
+import asyncio
+import threading
+import multiprocessing
+import concurrent.futures
+import SudokuBoard
+import SolverServer
+
+"""
+    asyncio front end for the solver. Searches run in a process pool (or a
+    thread pool with processes=False) so the event loop is never blocked,
+    and at most maxConcurrent of them run at once; the others wait for a
+    slot. Solvers in one process share the trail counters and variable
+    version stamps, so with processes=False maxConcurrent must be 1 and a
+    larger one raises ValueError.
+
+        solver = AsyncSolver.AsyncSolver( maxConcurrent=4 )
+        result = await solver.solve( sudokudata, ["MRV", "LCV", "FC"], timeLimit=30 )
+        if result["status"] == "solved":
+            print( result["solution"] )
+
+    The result has the fields of a SolverServer reply, with "solution" as a
+    SudokuBoard (that is, BTSolver.getSolution of the search). Cancelling
+    the awaiting task sets an event the search polls, so the worker stops
+    within BTSolver.pollInterval seconds and its slot is only freed once it
+    has. With onProgress, BTSolver.progress snapshots are passed to it on
+    the event loop every progressInterval seconds while the search runs.
+
+    Usage: python3 AsyncSolver.py DIR_OR_BOARD... [FLAGS...] [CONCURRENCY=n] [TIMEOUT=s]
+"""
+
+DEFAULT_TIME_LIMIT = 600
+
+# How often progress queues are drained on the event loop, in seconds
+PROGRESS_POLL = 0.2
+
+# Runs one search inside a pool worker, wiring the cancel event and the
+# progress queue into the solver
+def solveInWorker ( text, flags, timeLimit, cancelEvent, progressQueue, progressInterval ):
+    settings = { "cancelEvent" : cancelEvent, "progressInterval" : progressInterval }
+    if progressQueue != None:
+        settings["progressCallback"] = progressQueue.put
+    return SolverServer.solveText( text, flags, timeLimit, settings )
+
+class AsyncSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, maxConcurrent = None, processes = True, progressInterval = 1.0 ):
+        if maxConcurrent == None:
+            maxConcurrent = os.cpu_count() if processes else 1
+        if not processes and maxConcurrent > 1:
+            raise ValueError( "threads share the solver counters, maxConcurrent must be 1 without processes" )
+        self.maxConcurrent = maxConcurrent
+        self.processes = processes
+        self.progressInterval = progressInterval
+        self.semaphore = asyncio.Semaphore( maxConcurrent )
+
+        # Events and queues must be shared through a manager to reach
+        # another process, plain ones do for threads
+        if processes:
+            self.manager = multiprocessing.Manager()
+            self.pool = concurrent.futures.ProcessPoolExecutor( max_workers=maxConcurrent )
+        else:
+            self.manager = None
+            self.pool = concurrent.futures.ThreadPoolExecutor( max_workers=maxConcurrent )
+
+    def makeEvent ( self ):
+        return self.manager.Event() if self.manager != None else threading.Event()
+
+    def makeQueue ( self ):
+        return self.manager.Queue() if self.manager != None else queue.Queue()
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    """
+        Solves a board without blocking the event loop.
+
+        Return: a dict with "status" (solved, unsolvable, timeout, cancelled
+                or error), "solution" as a SudokuBoard when solved,
+                "pushes", "backtracks" and "time"
+    """
+    async def solve ( self, sudokudata, flags = None, timeLimit = DEFAULT_TIME_LIMIT, onProgress = None ):
+        flags = list( flags ) if flags != None else []
+        async with self.semaphore:
+            loop = asyncio.get_event_loop()
+            cancelEvent = self.makeEvent()
+            progressQueue = self.makeQueue() if onProgress != None else None
+            future = loop.run_in_executor( self.pool, solveInWorker, sudokudata.toText(), flags, timeLimit,
+                                           cancelEvent, progressQueue, self.progressInterval )
+            try:
+                if progressQueue == None:
+                    result = await asyncio.shield( future )
+                else:
+                    result = await self.streamProgress( future, progressQueue, onProgress )
+            except asyncio.CancelledError:
+                # Hold the slot until the worker has actually stopped
+                cancelEvent.set()
+                try:
+                    await future
+                except Exception:
+                    pass
+                raise
+
+        if result.get( "solution" ) != None:
+            result["solution"] = SudokuBoard.SudokuBoard( text=result["solution"] )
+        return result
+
+    # Waits for the search, passing what it puts on progressQueue to onProgress
+    async def streamProgress ( self, future, progressQueue, onProgress ):
+        while True:
+            done, pending = await asyncio.wait( [ future ], timeout=PROGRESS_POLL )
+            while True:
+                try:
+                    onProgress( progressQueue.get_nowait() )
+                except queue.Empty:
+                    break
+            if done:
+                return future.result()
+
+    # The semaphore keeps the pool from queueing work, so there is nothing
+    # to cancel, only running searches to wait for
+    def shutdown ( self ):
+        self.pool.shutdown( wait=True )
+        if self.manager != None:
+            self.manager.shutdown()
+
+# ==================================================================
+# Command Line
+# ==================================================================
+
+async def solveAll ( boards, flags, timeLimit, concurrency ):
+    solver = AsyncSolver( concurrency )
+
+    async def solveOne ( path ):
+        def report ( progress ):
+            print( "{} depth {} ({}/{} assigned), {} backtracks, {:.1f}s".format(
+                path, progress["depth"], progress["assigned"], progress["cells"], progress["backtracks"], progress["elapsed"] ) )
+        result = await solver.solve( SudokuBoard.SudokuBoard( filepath=path ), flags, timeLimit, report )
+        print( "{} {} {:.2f}s".format( path, result["status"], result["time"] ) )
+
+    try:
+        await asyncio.gather( *[ solveOne( b ) for b in boards ] )
+    finally:
+        solver.shutdown()
+
+def main ( ):
+    boards = []
+    flags = []
+    timeLimit = DEFAULT_TIME_LIMIT
+    concurrency = os.cpu_count()
+
+    for arg in sys.argv[1:]:
+        if arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg.startswith("CONCURRENCY="):
+            concurrency = int( arg[len("CONCURRENCY="):] )
+        elif os.path.exists( arg ):
+            boards.extend( SudokuBoard.listBoards( arg ) )
+        else:
+            flags.append( arg )
+
+    if not boards:
+        print( "Usage: AsyncSolver DIR_OR_BOARD... [FLAGS...] [CONCURRENCY=n] [TIMEOUT=s]" )
+        return
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop( loop )
+    try:
+        loop.run_until_complete( solveAll( boards, flags, timeLimit, concurrency ) )
+    finally:
+        loop.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import random
+import SudokuBoard
+import BTSolver
+import Trail
+import Benchmark
+
+"""
+    Offline tuner for the heuristic flags. It runs a matrix of flag
+    configurations over a training corpus, learns a small decision tree
+    that picks a configuration from cheap board features, and saves it as a
+    JSON model that Main.py applies with the AUTO flag.
+
+    Usage: python3 AutoTuner.py DIR... [MODEL=path] [CONFIG="flags"]... [TIMEOUT=s] [HOLDOUT=f] [SEED=s] [DEPTH=d]
+
+    A fraction HOLDOUT of the boards is kept out of training and used to
+    report the speedup of the learned rule over the best single
+    configuration on the training boards, next to the best possible choice
+    per board. Unsolved runs count as twice the time limit.
+"""
+
+# The model trained on the bundled Boards, next to this file
+DEFAULT_MODEL = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "autotune.json" )
+
+DEFAULT_CONFIGS = [
+    "MRV LCV FC",
+    "MAD LCV FC",
+    "WDEG LCV FC",
+    "MRV LCV NOR",
+    "MAD LCV NOR",
+    "WDEG LCV NOR",
+    "MRV NOR MINCONF",
+]
+
+DEFAULT_TIME_LIMIT = 20
+
+# Leaves must hold at least this many training boards, and a split must
+# save at least this fraction of the total time of its node
+MIN_LEAF = 3
+MIN_GAIN = 0.05
+
+FEATURES = [ "size", "density", "candidates", "narrow" ]
+
+# Models already read, by path
+models = dict()
+
+# ==================================================================
+# Features
+# ==================================================================
+
+"""
+    Describes a board by
+        size:       N, the number of values
+        density:    fraction of the cells that are given
+        candidates: mean domain size of the open cells after forward
+                    checking the givens, relative to N
+        narrow:     fraction of the open cells left with at most two values
+
+    Return: a dict from the names in FEATURES to their values
+"""
+def features ( sudokudata ):
+    N = sudokudata.N
+    givens = sum( 1 for row in sudokudata.board for v in row if v != 0 )
+    solver = BTSolver.BTSolver( sudokudata, Trail.Trail(), "", "", "forwardChecking" )
+    solver.checkConsistency()
+
+    sizes = [ v.size() for v in solver.network.variables if v.isChangeable() ]
+    openCells = max( 1, len(sizes) )
+    return {
+        "size"       : N,
+        "density"    : givens / float( N*N ),
+        "candidates" : sum( sizes ) / float( openCells * N ),
+        "narrow"     : sum( 1 for s in sizes if s <= 2 ) / float( openCells ),
+    }
+
+# ==================================================================
+# Model
+# ==================================================================
+
+# Returns the configuration in times (config -> per-board times) with the least total
+def bestConfig ( times, boards ):
+    return min( sorted( times ), key = lambda c: sum( times[c][b] for b in boards ) )
+
+def totalTime ( times, config, boards ):
+    return sum( times[config][b] for b in boards )
+
+"""
+    Grows a decision tree whose leaves hold the configuration with the least
+    total time over their boards. A split is kept only if it lowers that
+    total by MIN_GAIN.
+
+    Return: a node, either { "config" } or { "feature", "threshold", "left",
+            "right" } where boards with feature <= threshold go left
+"""
+def buildTree ( times, feats, boards, depth ):
+    config = bestConfig( times, boards )
+    node = { "config" : config }
+    if depth == 0 or len(boards) < 2 * MIN_LEAF:
+        return node
+
+    best = ( 1 - MIN_GAIN ) * totalTime( times, config, boards )
+    split = None
+    for feature in FEATURES:
+        values = sorted( set( feats[b][feature] for b in boards ) )
+        for low, high in zip( values, values[1:] ):
+            threshold = ( low + high ) / 2.0
+            left  = [ b for b in boards if feats[b][feature] <= threshold ]
+            right = [ b for b in boards if feats[b][feature] > threshold ]
+            if len(left) < MIN_LEAF or len(right) < MIN_LEAF:
+                continue
+            cost = totalTime( times, bestConfig( times, left ), left ) \
+                 + totalTime( times, bestConfig( times, right ), right )
+            if cost < best:
+                best = cost
+                split = ( feature, threshold, left, right )
+
+    if split == None:
+        return node
+
+    feature, threshold, left, right = split
+    return {
+        "feature"   : feature,
+        "threshold" : threshold,
+        "left"      : buildTree( times, feats, left, depth - 1 ),
+        "right"     : buildTree( times, feats, right, depth - 1 ),
+    }
+
+# Returns the configuration the tree picks for a board's features
+def predict ( tree, feats ):
+    while "config" not in tree:
+        tree = tree["left"] if feats[tree["feature"]] <= tree["threshold"] else tree["right"]
+    return tree["config"]
+
+def readModel ( path ):
+    if path not in models:
+        with open( path ) as f:
+            models[path] = json.load( f )
+    return models[path]
+
+# Returns the Main.py flags the model picks for a board
+def selectFlags ( path, sudokudata ):
+    return predict( readModel( path )["tree"], features( sudokudata ) ).split()
+
+# ==================================================================
+# Training
+# ==================================================================
+
+# Times every configuration on every board, counting failures as 2 * timeLimit
+def runMatrix ( boards, configs, timeLimit ):
+    times = { c : dict() for c in configs }
+    for config in configs:
+        for b in boards:
+            result = Benchmark.runBoard( b, config, timeLimit )
+            times[config][b] = result["time"] if result["solved"] else 2 * timeLimit
+    return times
+
+def main ( ):
+    paths = []
+    configs = []
+    modelPath = DEFAULT_MODEL
+    timeLimit = DEFAULT_TIME_LIMIT
+    holdout = 0.25
+    seed = 0
+    depth = 2
+
+    for arg in sys.argv[1:]:
+        if arg.startswith("MODEL="):
+            modelPath = arg[len("MODEL="):]
+        elif arg.startswith("CONFIG="):
+            configs.append( arg[len("CONFIG="):] )
+        elif arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg.startswith("HOLDOUT="):
+            holdout = float( arg[len("HOLDOUT="):] )
+        elif arg.startswith("SEED="):
+            seed = int( arg[len("SEED="):] )
+        elif arg.startswith("DEPTH="):
+            depth = int( arg[len("DEPTH="):] )
+        else:
+            paths.append( arg )
+
+    if not paths:
+        print( "Usage: AutoTuner DIR... [MODEL=path] [CONFIG=\"flags\"]... [TIMEOUT=s] [HOLDOUT=f] [SEED=s] [DEPTH=d]" )
+        return
+
+    if not configs:
+        configs = DEFAULT_CONFIGS
+
+    boards = [ b for path in paths for b in SudokuBoard.listBoards( path ) ]
+    random.Random( seed ).shuffle( boards )
+    numHeldOut = int( holdout * len(boards) )
+    heldOut = boards[:numHeldOut]
+    training = boards[numHeldOut:]
+
+    feats = { b : features( SudokuBoard.SudokuBoard( filepath=b ) ) for b in boards }
+    times = runMatrix( boards, configs, timeLimit )
+
+    tree = buildTree( times, feats, training, depth )
+    with open( modelPath, "w" ) as f:
+        json.dump( { "features" : FEATURES, "configs" : configs, "timeLimit" : timeLimit, "tree" : tree }, f, indent=2 )
+    print( "Model written to " + modelPath )
+
+    for config in configs:
+        print( "{:<28} training {:>9.2f}s".format( config, totalTime( times, config, training ) ) )
+
+    if heldOut:
+        fixed = bestConfig( times, training )
+        fixedTime = totalTime( times, fixed, heldOut )
+        autoTime = sum( times[predict( tree, feats[b] )][b] for b in heldOut )
+        oracleTime = sum( min( times[c][b] for c in configs ) for b in heldOut )
+        print( "Held-out boards: " + str(len(heldOut)) )
+        print( "Best fixed ({}): {:.2f}s".format( fixed, fixedTime ) )
+        print( "AUTO: {:.2f}s (speedup x{:.2f})".format( autoTime, fixedTime / autoTime if autoTime > 0 else 0 ) )
+        print( "Oracle: {:.2f}s (speedup x{:.2f})".format( oracleTime, fixedTime / oracleTime if oracleTime > 0 else 0 ) )
+
+if __name__ == "__main__":
+    main()
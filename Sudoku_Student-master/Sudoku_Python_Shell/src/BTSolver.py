@@ -4,8 +4,18 @@ import Domain
 import Trail
 import Constraint
 import ConstraintNetwork
+import AllDifferent
+import BitBoard
+import sys
+import os
+import json
 import time
 import random
+import itertools
+import math
+
+# Returned by solve when a run of solveWithRestarts reaches its backtrack cutoff
+RESTART_CUTOFF = -2
 
 class BTSolver:
 
@@ -22,7 +32,132 @@ class BTSolver:
         self.varHeuristics = var_sh
         self.valHeuristics = val_sh
         self.cChecks = cc
-    
+
+        # Wall-clock time (time.time()) after which solve gives up, or None.
+        # timedOut records that the search gave up on time_left or deadline.
+        self.deadline = None
+        self.timedOut = False
+
+        # Cooperative control from another thread or process: every
+        # pollInterval seconds solve checks cancelEvent (anything with
+        # is_set, such as a threading or multiprocessing Event) and gives
+        # up like on a deadline if it is set, and every progressInterval
+        # seconds it passes progress() to progressCallback
+        self.cancelEvent = None
+        self.cancelled = False
+        self.progressCallback = None
+        self.pollInterval = 0.1
+        self.progressInterval = 1.0
+        self.lastPoll = time.time()
+        self.lastProgress = time.time()
+        self.startTime = time.time()
+        self.startUndos = trail.getUndoCount()
+        self.startPushes = trail.getPushCount()
+
+        # Search stops once this many solutions have been found
+        self.solutionLimit = 1
+        self.solutionCount = 0
+        self.solutions = []
+
+        # Largest naked/hidden subset searched for after the consistency
+        # check, 0 to disable. subsetStamps holds, for each constraint, the
+        # Variable.versionCounter value when it was last reduced.
+        self.subsetOrder = 0
+        self.subsetStamps = dict()
+
+        # Whether pointing pairs / box-line reduction run after the
+        # consistency check, with the same kind of stamps per intersection
+        self.intersections = False
+        self.intersectionStamps = dict()
+
+        # Restarts: ties in the variable and value heuristics are broken at
+        # random, and each run gives up after backtrackLimit backtracks.
+        # varWeights counts the failures after assigning each variable; it
+        # survives restarts and is preferred among tied variables.
+        self.randomize = False
+        self.random = random.Random()
+        self.restartSchedule = "luby"
+        self.restartBase = 100
+        self.restartFactor = 1.5
+        self.backtrackLimit = None
+        self.runStartUndos = 0
+        self.cutoffReached = False
+        self.restarts = 0
+        self.varWeights = dict()
+
+        # Checkpointing: frames is the decision stack of the running search,
+        # one [variable index, values left to try] per level with the value
+        # being explored first. It is written to checkpointPath every
+        # checkpointInterval seconds and when the search runs out of time.
+        # replay holds the frames of a loaded checkpoint still to re-enter
+        # and restoredSolutions the solutions it had already found.
+        self.frames = []
+        self.replay = []
+        self.restoredSolutions = set()
+        self.checkpointPath = None
+        self.checkpointInterval = 60
+        self.checkpointFlags = []
+        self.lastCheckpoint = time.time()
+        self.variableIndex = { v : i for i, v in enumerate(self.network.variables) }
+
+        # Discrepancy search: with discrepancyLimit set, solve only follows
+        # paths that deviate from the value ordering within the limit. In
+        # "lds" mode taking the i-th value of a node costs i discrepancies
+        # out of the limit; in "dds" mode any value may be taken above depth
+        # discrepancyLimit and only the first one below it. discrepancyCut
+        # records whether the limit cut anything off.
+        self.discrepancyMode = "lds"
+        self.discrepancyLimit = None
+        self.discrepancies = 0
+        self.discrepancyCut = False
+        self.discrepancyIterations = 0
+
+        # Singleton arc consistency probing at search depths up to
+        # probeDepth (0 for the root only, None to disable): each value of
+        # each open variable is assigned and propagated, and removed if that
+        # fails. With forward checking alone, probeCache maps (variable
+        # index, value) to the versionCounter, the variables read and their
+        # domain fingerprint at its last successful probe, which is skipped
+        # while they still hold.
+        # probeStats holds probes made, probes skipped as cached, values
+        # removed and seconds spent.
+        self.probeDepth = None
+        self.probing = False
+        self.probeCache = dict()
+        self.probeStats = [ 0, 0, 0, 0.0 ]
+
+        # Board (list of rows) of values tried first at each cell, such as a
+        # previous solution, or None
+        self.warmStart = None
+
+        # Norvig's check skips constraints unchanged since their last pass
+        self.norvigStamps = dict()
+
+        # All-different GAC ("gacCheck"): one propagator per constraint,
+        # built on first use, and the passes, constraints skipped as
+        # unchanged, values pruned, wipeouts found and seconds spent
+        self.allDifferents = None
+        self.gacStats = [ 0, 0, 0, 0, 0.0 ]
+
+        # Adaptive propagation ("adaptive" check): each search node picks one
+        # of adaptiveArms for the checks of its assignments, per depth band
+        # (depths split at adaptiveBands). armCosts[(band, arm)] holds the
+        # number of nodes and total seconds spent in their subtrees, and
+        # checkStats[arm] the calls, seconds, values pruned and failures of
+        # the checks themselves.
+        self.adaptiveArms = [ "forwardChecking", "norvigCheck", "norvigIntersections" ]
+        self.adaptiveBands = [ 2, 8, 32 ]
+        self.currentArm = "norvigCheck"
+        self.armCosts = dict()
+        self.checkStats = { arm : [ 0, 0.0, 0, 0 ] for arm in self.adaptiveArms }
+
+        # The search recurses once per assignment
+        sys.setrecursionlimit( max( sys.getrecursionlimit(), 2*len(self.network.variables) + 1000 ) )
+
+        # Value heuristics read incrementally maintained support counts
+        if val_sh in ["LeastConstrainingValue", "tournVal"]:
+            self.network.enableSupportCounts()
+
 
     # ==================================================================
     # Consistency Checks
@@ -35,6 +170,17 @@ class BTSolver:
                 return False
         return True
 
+    """
+        Consistency check after v was assigned. Every assignment is checked
+        when it is propagated, so only the constraints containing v can have
+        become inconsistent; this keeps the check O(N) on large boards.
+    """
+    def assignmentsCheckFor ( self, v ):
+        for c in self.network.getConstraintsContainingVariable( v ):
+            if not c.isConsistent():
+                return False
+        return True
+
     """
         Part 1 TODO: Implement the Forward Checking Heuristic
 
@@ -56,7 +202,9 @@ class BTSolver:
                 if not neigh.isAssigned() and neigh.getDomain().contains(assignment):
                     self.trail.push(neigh)
                     neigh.removeValueFromDomain(assignment)
-                    if neigh.getDomain().isEmpty(): return ({}, False)
+                    if neigh.getDomain().isEmpty():
+                        self.bumpConstraintWeights(v, neigh)
+                        return ({}, False)
                     # Not sure if I should assign the neighbor if its domain size is 1
                     # If not needed, could legit just trackback to last assigned value (self.lastAssigned)
                     # elif neigh.size() == 1:
@@ -64,7 +212,7 @@ class BTSolver:
                     #    neigh.assignValue(neigh.domain.values[0])
                     #    neigh.setModified(True)
             
-            return ({},self.assignmentsCheck())
+            return ({},self.assignmentsCheckFor(v))
         
         for v in self.network.variables:
             if v.isAssigned() and v.isModified(): # Very weird 'modified' status
@@ -74,6 +222,12 @@ class BTSolver:
 
         return ({},True) 
            
+    # Counts a domain wipeout of neigh caused by v against their shared constraints
+    def bumpConstraintWeights ( self, v, neigh ):
+        for c in self.network.getConstraintsContainingVariable( neigh ):
+            if c.contains( v ):
+                c.weight += 1
+
     # =================================================================
 	# Arc Consistency
 	# =================================================================
@@ -118,13 +272,15 @@ class BTSolver:
                 if not neigh.isAssigned() and neigh.getDomain().contains(assignment):
                     self.trail.push(neigh)
                     neigh.removeValueFromDomain(assignment)
-                    if neigh.getDomain().isEmpty(): return ({}, False)
+                    if neigh.getDomain().isEmpty():
+                        self.bumpConstraintWeights(v, neigh)
+                        return ({}, False)
                     # Not sure if I should assign the neighbor if its domain size is 1
                     # elif neigh.size() == 1:
                     #     self.trail.push(neigh)
                     #     neigh.assignValue(neigh.domain.values[0])
                     #     neigh.setModified(True)
-            return ({},self.assignmentsCheck())
+            return ({},self.assignmentsCheckFor(v))
 
         for c in self.network.constraints:
             for v in c.vars:
@@ -132,22 +288,39 @@ class BTSolver:
                     checkResults = removeValueFromNeighbors(v)
                     v.setModified(False)
                     if checkResults[1] == False: return ({},False)
-            
+
+            # Nothing in c changed since its last full pass
+            if max( v.version for v in c.vars ) <= self.norvigStamps.get( c, -1 ):
+                continue
+            self.norvigStamps[c] = Variable.Variable.versionCounter
+
+            # Places of every value, gathered in one pass over the domains
+            places = dict()
+            for var in c.vars:
+                for val in var.getValues():
+                    places.setdefault( val, [] ).append( var )
+
+            assigned_here = False
             for val in range(1,self.gameboard.N+1):
-                pos_count = 0
-                temp_var = None
-                for var in c.vars:
-                    if var.getDomain().contains(val):
-                        pos_count += 1
-                        temp_var = var
-                        if pos_count == 2: break
-                if pos_count == 0: return ({},False)
-                elif pos_count == 1 and not temp_var.isAssigned(): 
+                candidates = places.get( val, [] )
+                if assigned_here:
+                    candidates = [ var for var in candidates if var.getDomain().contains(val) ]
+                pos_count = len(candidates)
+                if pos_count == 0:
+                    c.weight += 1
+                    del self.norvigStamps[c]
+                    return ({},False)
+                elif pos_count == 1 and not candidates[0].isAssigned(): 
+                    temp_var = candidates[0]
                     self.trail.push(temp_var)
                     temp_var.assignValue(val)
                     temp_var.setModified(True)
+                    assigned_here = True
 
-            if not c.isConsistent(): return ({},False)
+            if not c.isConsistent():
+                c.weight += 1
+                del self.norvigStamps[c]
+                return ({},False)
  
         return ({},True)
             
@@ -177,7 +350,7 @@ class BTSolver:
                     self.trail.push(neigh)
                     neigh.removeValueFromDomain(assignment)
                     if neigh.getDomain().isEmpty(): return ({}, False)
-            return ({},self.assignmentsCheck())
+            return ({},self.assignmentsCheckFor(v))
         
         for c in self.network.constraints:
             # Forward Checking
@@ -222,6 +395,437 @@ class BTSolver:
                     
         return True
 
+    # =================================================================
+    # Naked and Hidden Subsets
+    # =================================================================
+
+    """
+        Looks for naked and hidden subsets of up to self.subsetOrder cells
+        in every constraint whose variables changed since it was last
+        reduced.
+
+        A naked subset is k cells whose candidates together are k values;
+        those values are removed from the rest of the constraint. A hidden
+        subset is k values that can only go in the same k cells; every
+        other value is removed from those cells.
+
+        Return: a pair of a bool and a bool. The first is true if any domain
+                was modified, the second is true if the network is still
+                consistent.
+    """
+    def subsetCheck ( self ):
+        changed = False
+        dirty = True
+
+        while dirty:
+            dirty = False
+            for c in self.network.constraints:
+                if max( v.version for v in c.vars ) <= self.subsetStamps.get( c, -1 ):
+                    continue
+
+                reduced, consistent = self.reduceSubsets( c )
+                if not consistent:
+                    return ( changed, False )
+
+                self.subsetStamps[c] = Variable.Variable.versionCounter
+                if reduced:
+                    changed = True
+                    dirty = True
+
+        return ( changed, True )
+
+    # Runs the subset rules on one constraint until nothing changes
+    def reduceSubsets ( self, c ):
+        changed = False
+        placed = 0
+        for v in c.vars:
+            if v.isAssigned():
+                placed |= 1 << v.getAssignment()
+        cells = [ v for v in c.vars if not v.isAssigned() ]
+        values = [ val for val in range( 1, self.gameboard.N+1 ) if not placed >> val & 1 ]
+
+        reduced = True
+        while reduced:
+            reduced = False
+            masks = [ self.domainMask( v ) for v in cells ]
+
+            # Naked subsets
+            for k in range( 2, self.subsetOrder+1 ):
+                candidates = [ i for i in range(len(cells)) if self.popcount( masks[i] ) <= k ]
+                for combo in itertools.combinations( candidates, k ):
+                    union = 0
+                    for i in combo:
+                        union |= masks[i]
+                    size = self.popcount( union )
+                    if size < k:
+                        return ( changed, False )
+                    if size > k:
+                        continue
+
+                    for i in range(len(cells)):
+                        if i not in combo and masks[i] & union:
+                            if not self.removeMask( cells[i], masks[i] & union ):
+                                return ( changed, False )
+                            masks[i] &= ~union
+                            reduced = True
+
+            # Hidden subsets
+            places = dict()
+            for val in values:
+                places[val] = 0
+                for i in range(len(cells)):
+                    if masks[i] >> val & 1:
+                        places[val] |= 1 << i
+                if places[val] == 0:
+                    return ( changed, False )
+
+            for k in range( 2, self.subsetOrder+1 ):
+                candidates = [ val for val in values if self.popcount( places[val] ) <= k ]
+                for combo in itertools.combinations( candidates, k ):
+                    union = 0
+                    keep = 0
+                    for val in combo:
+                        union |= places[val]
+                        keep |= 1 << val
+                    size = self.popcount( union )
+                    if size < k:
+                        return ( changed, False )
+                    if size > k:
+                        continue
+
+                    for i in range(len(cells)):
+                        if union >> i & 1 and masks[i] & ~keep:
+                            if not self.removeMask( cells[i], masks[i] & ~keep ):
+                                return ( changed, False )
+                            masks[i] &= keep
+                            reduced = True
+
+            changed = changed or reduced
+
+        return ( changed, True )
+
+    # =================================================================
+    # Intersection Removal
+    # =================================================================
+
+    """
+        Uses the overlap of each block with each row and column. If a value
+        can only go in the overlap as far as the block is concerned, it is
+        removed from the rest of the line (pointing), and if it can only go
+        in the overlap as far as the line is concerned, it is removed from
+        the rest of the block (box-line reduction).
+
+        Only intersections whose variables changed since they were last
+        reduced are revisited.
+
+        Return: a pair of a bool and a bool. The first is true if any domain
+                was modified, the second is true if the network is still
+                consistent.
+    """
+    def intersectionCheck ( self ):
+        topology = self.network.topology
+        if topology == None:
+            return ( False, True )
+
+        variables = self.network.variables
+        changed = False
+        dirty = True
+
+        while dirty:
+            dirty = False
+            unitVersions = [ max( variables[i].version for i in unit ) for unit in topology.units ]
+
+            for key in topology.intersections:
+                stamp = self.intersectionStamps.get( key, -1 )
+                if unitVersions[key[0]] <= stamp and unitVersions[key[1]] <= stamp:
+                    continue
+
+                reduced, consistent = self.reduceIntersection( key[2], key[3], key[4] )
+                if not consistent:
+                    return ( changed, False )
+
+                self.intersectionStamps[key] = Variable.Variable.versionCounter
+                if reduced:
+                    changed = True
+                    dirty = True
+
+        return ( changed, True )
+
+    # Applies both intersection rules to one block and one line
+    def reduceIntersection ( self, overlap, blockRest, lineRest ):
+        variables = self.network.variables
+        overlapMask = 0
+        blockRestMask = 0
+        lineRestMask = 0
+        blockPlaced = 0
+        linePlaced = 0
+
+        for i in overlap:
+            v = variables[i]
+            if v.isAssigned():
+                blockPlaced |= 1 << v.getAssignment()
+            else:
+                overlapMask |= self.domainMask( v )
+        linePlaced = blockPlaced
+
+        blockCells = []
+        for i in blockRest:
+            v = variables[i]
+            if v.isAssigned():
+                blockPlaced |= 1 << v.getAssignment()
+            else:
+                blockCells.append( v )
+                blockRestMask |= self.domainMask( v )
+
+        lineCells = []
+        for i in lineRest:
+            v = variables[i]
+            if v.isAssigned():
+                linePlaced |= 1 << v.getAssignment()
+            else:
+                lineCells.append( v )
+                lineRestMask |= self.domainMask( v )
+
+        changed = False
+        pointing = overlapMask & ~blockRestMask & ~blockPlaced & lineRestMask
+        claiming = overlapMask & ~lineRestMask & ~linePlaced & blockRestMask
+
+        for cells, mask in [ ( lineCells, pointing ), ( blockCells, claiming ) ]:
+            if mask == 0:
+                continue
+            for v in cells:
+                if self.domainMask( v ) & mask:
+                    changed = True
+                    if not self.removeMask( v, mask ):
+                        return ( changed, False )
+
+        return ( changed, True )
+
+    # Returns the domain of v as a bit mask (bit d set if d is a candidate)
+    def domainMask ( self, v ):
+        mask = 0
+        for val in v.getValues():
+            mask |= 1 << val
+        return mask
+
+    def popcount ( self, mask ):
+        return bin( mask ).count( "1" )
+
+    # Removes the values in mask from v's domain, saving it on the trail first
+    def removeMask ( self, v, mask ):
+        self.trail.push( v )
+        for val in [ val for val in v.getValues() if mask >> val & 1 ]:
+            v.removeValueFromDomain( val )
+        return not v.getDomain().isEmpty()
+
+    # =================================================================
+    # All-Different GAC
+    # =================================================================
+
+    """
+        Forward checks the assignments, then makes every constraint
+        generalized arc consistent as an all-different (see AllDifferent)
+        until no domain changes. Constraints none of whose variables
+        changed since their last pass are skipped, and each keeps its
+        matching between calls.
+
+        Return: true if the network is still consistent
+    """
+    def gacCheck ( self ):
+        if not self.forwardChecking()[1]:
+            return False
+
+        if self.allDifferents == None:
+            self.allDifferents = [ AllDifferent.AllDifferent( c ) for c in self.network.getConstraints() ]
+
+        start = time.time()
+        stats = self.gacStats
+        try:
+            changed = True
+            while changed:
+                changed = False
+                for gac in self.allDifferents:
+                    if max( v.version for v in gac.vars ) <= gac.stamp:
+                        stats[1] += 1
+                        continue
+
+                    stats[0] += 1
+                    removed, consistent = gac.propagate( self.trail )
+                    stats[2] += removed
+                    if not consistent:
+                        stats[3] += 1
+                        gac.constraint.weight += 1
+                        return False
+                    changed = changed or removed > 0
+            return True
+        finally:
+            stats[4] += time.time() - start
+
+    # Returns the pruning statistics of gacCheck as lines
+    def gacReport ( self ):
+        passes, skipped, pruned, wipeouts, seconds = self.gacStats
+        return [ "GAC: {} passes ({} skipped as unchanged), {} values pruned, {} wipeouts, {:.2f}s".format(
+            passes, skipped, pruned, wipeouts, seconds ) ]
+
+    # =================================================================
+    # Bit Board Propagation
+    # =================================================================
+
+    """
+        Forward checking, then hidden singles and intersection removal
+        read off the network's BitBoard, repeated until nothing changes.
+        New hidden singles are forward checked before intersections are
+        looked at again.
+
+        Return: true if the network is still consistent
+    """
+    def bitCheck ( self ):
+        self.network.enableBitBoard()
+        bits = self.network.bitBoard
+        variables = self.network.variables
+
+        while True:
+            if not self.forwardChecking()[1] or not bits.isConsistent():
+                return False
+
+            changed = False
+            for i, val in bits.hiddenSingles():
+                v = variables[i]
+                if not v.isAssigned() and v.getDomain().contains( val ):
+                    self.trail.push( v )
+                    v.assignValue( val )
+                    v.setModified( True )
+                    changed = True
+            if changed:
+                continue
+
+            for mask, val in bits.intersectionRemovals():
+                for i in BitBoard.cellsOf( mask ):
+                    v = variables[i]
+                    if v.getDomain().contains( val ):
+                        self.trail.push( v )
+                        v.removeValueFromDomain( val )
+                        changed = True
+            if not changed:
+                return True
+
+    # =================================================================
+    # Singleton Arc Consistency Probing
+    # =================================================================
+
+    # Whether the current node is shallow enough to probe
+    def shouldProbe ( self ):
+        return self.probeDepth != None and not self.probing and len( self.frames ) <= self.probeDepth
+
+    """
+        Probes every value of every open variable: the value is assigned
+        and propagated by propagateProbe, then the trail is restored to the
+        marker placed before. Values whose probe fails cannot be part of a
+        solution below this node and are removed.
+
+        With forward checking alone, a probe only reads the variables it
+        assigned and their peers, so a probe that succeeded is not repeated
+        while none of those changed. Restoring a probe puts domains back
+        but bumps their versions, so when the version test fails the
+        domains are compared with a fingerprint taken at the successful
+        probe. Other checks and stacked propagators read more, and every
+        probe is made.
+
+        Return: a pair of a bool and a bool. The first is true if any domain
+                was modified, the second is true if the network is still
+                consistent.
+    """
+    def probeCheck ( self ):
+        start = time.time()
+        stats = self.probeStats
+        self.probing = True
+        changed = False
+        useCache = self.cChecks == "forwardChecking" and self.subsetOrder < 2 and not self.intersections
+        try:
+            for v in self.network.variables:
+                if v.isAssigned() or v.size() < 2:
+                    continue
+                index = self.variableIndex[v]
+
+                for val in list( v.getValues() ):
+                    key = ( index, val )
+                    cached = self.probeCache.get( key ) if useCache else None
+                    if cached != None:
+                        stamp, reads, fingerprint = cached
+                        if max( n.version for n in reads ) <= stamp:
+                            stats[1] += 1
+                            continue
+                        if self.fingerprint( reads ) == fingerprint:
+                            self.probeCache[key] = ( Variable.Variable.versionCounter, reads, fingerprint )
+                            stats[1] += 1
+                            continue
+
+                    stats[0] += 1
+                    self.trail.placeTrailMarker()
+                    assigned = []
+                    consistent = self.propagateProbe( v, val, assigned )
+
+                    # Undoing a probe is not a backtrack of the search
+                    self.trail.restore()
+                    if self.cancelled:
+                        return ( changed, False )
+
+                    if consistent:
+                        if useCache:
+                            reads = set( assigned )
+                            for n in assigned:
+                                reads.update( self.network.getNeighborsOfVariable( n ) )
+                            reads = tuple( reads )
+                            self.probeCache[key] = ( Variable.Variable.versionCounter, reads, self.fingerprint( reads ) )
+                        continue
+
+                    stats[2] += 1
+                    changed = True
+                    self.trail.push( v )
+                    v.removeValueFromDomain( val )
+                    if v.getDomain().isEmpty():
+                        return ( changed, False )
+            return ( changed, True )
+        finally:
+            self.probing = False
+            stats[3] += time.time() - start
+
+    """
+        Assigns val to v and propagates it: the configured check is run,
+        then every variable it narrowed to a single value is assigned and
+        the check run again, until none is left. Forward checking never
+        assigns those itself, so without the cascade a probe could only
+        fail at a peer of v and would refute next to nothing.
+
+        Every variable assigned is appended to assigned.
+
+        Return: true if the network is still consistent
+    """
+    def propagateProbe ( self, v, val, assigned ):
+        mark = len( self.trail.trailStack )
+        self.trail.push( v )
+        v.assignValue( val )
+        assigned.append( v )
+        while self.checkConsistency():
+            singletons = [ n for n, domain in self.trail.trailStack[mark:] if not n.isAssigned() and n.size() == 1 ]
+            if not singletons:
+                return True
+            for n in singletons:
+                if not n.isAssigned():
+                    self.trail.push( n )
+                    n.assignValue( n.getValues()[0] )
+                    assigned.append( n )
+        return False
+
+    # Hash of the domains and assignments of variables
+    def fingerprint ( self, variables ):
+        return hash( tuple( ( n.isAssigned(), tuple( n.getValues() ) ) for n in variables ) )
+
+    # Returns the probing statistics as lines
+    def probeReport ( self ):
+        probes, cached, removed, seconds = self.probeStats
+        return [ "Probing: {} probes ({} skipped as cached), {} values refuted, {:.2f}s".format( probes, cached, removed, seconds ) ]
+
     # ==================================================================
     # Variable Selectors
     # ==================================================================
@@ -245,6 +849,11 @@ class BTSolver:
         for v in self.network.variables:
             if not v.isAssigned() and (min_var == None or min_var.size() > v.size()):
                 min_var = v
+                # Nothing beats a singleton once the network is consistent
+                if min_var.size() <= 1 and not self.randomize:
+                    break
+        if self.randomize and min_var != None:
+            return self.breakTies( [ v for v in self.network.variables if not v.isAssigned() and v.size() == min_var.size() ] )
         return min_var
     """
         Part 2 TODO: Implement the Minimum Remaining Value Heuristic
@@ -265,8 +874,9 @@ class BTSolver:
                     min_var.append(v)
                 elif min_var[-1].size() == v.size():
                     min_var.append(v)
+        min_var = self.tieOrder(min_var)
         return sorted(min_var, \
-                      key = lambda x : sum(1 if not n.isAssigned() else 0 for n in self.network.getNeighborsOfVariable(x)), reverse=True) if len(min_var) != 0 else [None]
+                      key = lambda x : (sum(1 if not n.isAssigned() else 0 for n in self.network.getNeighborsOfVariable(x)), self.learnedWeight(x)), reverse=True) if len(min_var) != 0 else [None]
 
     """
          Optional TODO: Implement your own advanced Variable Heuristic
@@ -289,9 +899,64 @@ class BTSolver:
                     min_var.append(v)
                 elif min_var[-1].size() == v.size():
                     min_var.append(v)
+        min_var = self.tieOrder(min_var)
         
         return sorted(min_var, \
-               key = lambda x : sum(1*hasOverlap(v,n) if not n.isAssigned() else 0 for n in self.network.getNeighborsOfVariable(x)), reverse=True)[0] if len(min_var) != 0 else None
+               key = lambda x : (sum(1*hasOverlap(v,n) if not n.isAssigned() else 0 for n in self.network.getNeighborsOfVariable(x)), self.learnedWeight(x)), reverse=True)[0] if len(min_var) != 0 else None
+
+    """
+        Conflict-directed variable heuristic (dom/wdeg). Every constraint
+        starts with weight 1, and forward checking and Norvig's check add 1
+        each time the constraint wipes out a domain. The weighted degree of
+        a variable is the total weight of its constraints that still have
+        another unassigned variable.
+
+        Return: The unassigned variable with the smallest domain size to
+                weighted degree ratio
+    """
+    def getDomWdeg ( self ):
+        unassigned = dict()
+        for c in self.network.constraints:
+            unassigned[c] = sum( 1 for v in c.vars if not v.isAssigned() )
+
+        best = []
+        bestScore = None
+        for v in self.network.variables:
+            if v.isAssigned():
+                continue
+
+            wdeg = sum( c.weight for c in self.network.getConstraintsContainingVariable( v ) if unassigned[c] > 1 )
+            score = v.size() / wdeg if wdeg > 0 else float( "inf" )
+            if bestScore == None or score < bestScore:
+                best = [v]
+                bestScore = score
+            elif score == bestScore:
+                best.append( v )
+
+        if not best:
+            return None
+        if self.randomize:
+            return self.breakTies( best )
+        return best[0]
+
+    # Picks among equally good variables: highest learned weight, then random
+    def breakTies ( self, candidates ):
+        best = max( self.learnedWeight( v ) for v in candidates )
+        return self.random.choice( [ v for v in candidates if self.learnedWeight( v ) == best ] )
+
+    # Returns the failure count of v, only used when ties are randomized
+    def learnedWeight ( self, v ):
+        if not self.randomize:
+            return 0
+        return self.varWeights.get( v, 0 )
+
+    # Returns a shuffled copy when randomizing, so a stable sort breaks ties at random
+    def tieOrder ( self, items ):
+        if not self.randomize:
+            return items
+        items = list( items )
+        self.random.shuffle( items )
+        return items
     
     # ==================================================================
     # Value Selectors
@@ -312,11 +977,10 @@ class BTSolver:
                 The LCV is first and the MCV is last
     """
     def getValuesLCVOrder ( self, v ):
-        def returnNeighsContains(val, neighs:list):
-            return sum(n.getDomain().contains(val) for n in neighs)
-        values = v.domain.values
-        neighs = self.network.getNeighborsOfVariable(v)
-        return sorted(values, key = lambda x: returnNeighsContains(x,neighs))
+        values = self.tieOrder(v.domain.values)
+        counts = self.network.supportCounts[v]
+        assigned = self.network.assignedCounts[v]
+        return sorted(values, key = lambda x: counts[x] + assigned[x])
 
 
     """
@@ -327,42 +991,198 @@ class BTSolver:
      """
     def getTournVal ( self, v ):
         """LCV but with a weighted sum"""
-        def returnNeighsContains(val, neighs:list):
-            weighted_sum = 0
-            for n in neighs:
-                if n.getDomain().contains(val):
-                    if n.isAssigned():
-                        weighted_sum += 5
-                    else:
-                        weighted_sum += 1
-            return weighted_sum
-        values = v.domain.values
-        neighs = self.network.getNeighborsOfVariable(v)
-        return sorted(values, key = lambda x: returnNeighsContains(x,neighs))
+        values = self.tieOrder(v.domain.values)
+        counts = self.network.supportCounts[v]
+        assigned = self.network.assignedCounts[v]
+        return sorted(values, key = lambda x: 5*assigned[x] + counts[x])
+
+    # ==================================================================
+    # Adaptive Propagation
+    # ==================================================================
+
+    """
+        Runs the propagator picked for the current node (currentArm) and
+        records its cost and yield:
+            forwardChecking     - forward checking only
+            norvigCheck         - forward checking and hidden singles
+            norvigIntersections - hidden singles and intersection removal
+                                  repeated until neither prunes anything
+    """
+    def adaptiveCheck ( self ):
+        arm = self.currentArm
+        start = time.time()
+        pushes = self.trail.getPushCount()
+
+        if arm == "forwardChecking":
+            consistent = self.forwardChecking()[1]
+        else:
+            consistent = self.norvigCheck()[1]
+            while consistent and arm == "norvigIntersections":
+                reduced, consistent = self.intersectionCheck()
+                if not reduced or not consistent:
+                    break
+                consistent = self.norvigCheck()[1]
+
+        stats = self.checkStats[arm]
+        stats[0] += 1
+        stats[1] += time.time() - start
+        stats[2] += self.trail.getPushCount() - pushes
+        stats[3] += 0 if consistent else 1
+        return consistent
+
+    # Returns the band of a search depth
+    def depthBand ( self, depth ):
+        band = 0
+        while band < len(self.adaptiveBands) and depth >= self.adaptiveBands[band]:
+            band += 1
+        return band
+
+    """
+        Picks the propagator for a node of the band: each arm is tried
+        twice, then the one with the lowest confidence bound on the mean
+        time of the subtrees it was used for (UCB1 on costs).
+    """
+    def chooseArm ( self, band ):
+        costs = [ self.armCosts.get( ( band, arm ), [ 0, 0.0 ] ) for arm in self.adaptiveArms ]
+        for arm, cost in zip( self.adaptiveArms, costs ):
+            if cost[0] < 2:
+                return arm
+
+        nodes = sum( c[0] for c in costs )
+        scale = sum( c[1] for c in costs ) / nodes
+        bounds = [ c[1] / c[0] - scale * math.sqrt( 2 * math.log( nodes ) / c[0] ) for c in costs ]
+        return self.adaptiveArms[ bounds.index( min( bounds ) ) ]
+
+    # Returns the choices and check statistics of the adaptive mode as lines
+    def adaptiveReport ( self ):
+        lines = []
+        edges = [ 0 ] + self.adaptiveBands
+        for band in range( len(edges) ):
+            name = "depth " + str(edges[band]) + ( "-" + str(edges[band+1] - 1) if band + 1 < len(edges) else "+" )
+            picks = []
+            for arm in self.adaptiveArms:
+                count, seconds = self.armCosts.get( ( band, arm ), [ 0, 0.0 ] )
+                if count:
+                    picks.append( "{} {} ({:.2f}ms)".format( arm, count, 1000 * seconds / count ) )
+            if picks:
+                lines.append( "Adaptive " + name + ": " + ", ".join( picks ) )
+        for arm in self.adaptiveArms:
+            calls, seconds, pruned, failures = self.checkStats[arm]
+            if calls:
+                lines.append( "Adaptive {}: {} checks, {:.2f}s, {} values pruned, {} failures".format( arm, calls, seconds, pruned, failures ) )
+        return lines
 
     # ==================================================================
     # Engine Functions
     # ==================================================================
 
     def solve ( self, time_left=600):
-        if time_left <= 60:
+        if time_left <= 60 or ( self.deadline != None and time.time() > self.deadline ):
+            self.timedOut = True
+            if self.checkpointPath != None:
+                self.writeCheckpoint()
             return -1
 
         start_time = time.time()
-        if self.hassolution:
+        if start_time - self.lastPoll >= self.pollInterval:
+            self.poll( start_time )
+        if self.cancelled:
+            return -1
+
+        if self.solutionCount >= self.solutionLimit:
             return 0
 
-        # Variable Selection
-        v = self.selectNextVariable()
+        if self.checkpointPath != None and start_time - self.lastCheckpoint >= self.checkpointInterval:
+            self.writeCheckpoint()
 
-        # check if the assigment is complete
-        if ( v == None ):
-            # Success
-            self.hassolution = True
-            return 0
+        v = None
+        if self.replay:
+            # Re-enter a level of a loaded checkpoint. Propagation may differ
+            # from the run that wrote it (ADAPT depends on timing), so the
+            # rest of the replay is dropped once it no longer fits.
+            index, values = self.replay.pop( 0 )
+            v = self.network.variables[index]
+            if v.isAssigned() or not values or not v.getDomain().contains( values[0] ):
+                self.replay = []
+                v = None
+            else:
+                values = [ x for x in values if v.getDomain().contains( x ) ]
+
+        if v == None:
+            # Variable Selection
+            v = self.selectNextVariable()
+
+            # check if the assigment is complete
+            if ( v == None ):
+                # Subtrees being explored at checkpoint time are searched
+                # again, so their solutions may already have been counted
+                solution = self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q)
+                if solution.toText() in self.restoredSolutions:
+                    self.restoredSolutions.discard( solution.toText() )
+                    return 0
+
+                # Success
+                self.hassolution = True
+                self.solutionCount += 1
+                self.solutions.append( solution )
+                return 0
 
-        # Attempt to assign a value
-        for i in self.getNextValues( v ):
+            values = self.getNextValues( v )
+
+        arm = None
+        if self.cChecks == "adaptive":
+            band = self.depthBand( len( self.frames ) )
+            arm = self.chooseArm( band )
+
+        frame = [ self.variableIndex[v], list( values ) ]
+        self.frames.append( frame )
+        try:
+            return self.searchValues( v, frame, start_time, time_left, arm )
+        finally:
+            self.frames.pop()
+            if arm != None:
+                cost = self.armCosts.setdefault( ( band, arm ), [ 0, 0.0 ] )
+                cost[0] += 1
+                cost[1] += time.time() - start_time
+
+    # Checks for cancellation and reports progress when it is due
+    def poll ( self, now ):
+        self.lastPoll = now
+        if self.cancelEvent != None and self.cancelEvent.is_set():
+            self.cancelled = True
+        if self.progressCallback != None and now - self.lastProgress >= self.progressInterval:
+            self.lastProgress = now
+            self.progressCallback( self.progress() )
+
+    # Returns a snapshot of the running search as a dict
+    def progress ( self ):
+        return {
+            "depth"      : len( self.frames ),
+            "assigned"   : sum( 1 for v in self.network.variables if v.isAssigned() ),
+            "cells"      : len( self.network.variables ),
+            "backtracks" : self.trail.getUndoCount() - self.startUndos,
+            "pushes"     : self.trail.getPushCount() - self.startPushes,
+            "solutions"  : self.solutionCount,
+            "elapsed"    : time.time() - self.startTime,
+        }
+
+    # Tries each value left in the frame of v, dropping it once explored
+    def searchValues ( self, v, frame, start_time, time_left, arm = None ):
+        position = 0
+        while frame[1]:
+            i = frame[1][0]
+            if arm != None:
+                self.currentArm = arm
+
+            # The remaining values deviate even further from the ordering
+            if self.discrepancyLimit != None:
+                if self.discrepancyMode == "dds":
+                    allowed = position == 0 or len( self.frames ) <= self.discrepancyLimit
+                else:
+                    allowed = self.discrepancies + position <= self.discrepancyLimit
+                if not allowed:
+                    self.discrepancyCut = True
+                    return 0
 
             # Store place in trail and push variable's state on trail
             self.trail.placeTrailMarker()
@@ -376,19 +1196,197 @@ class BTSolver:
             if self.checkConsistency():
                 elapsed_time = time.time() - start_time 
                 new_start_time = time_left - elapsed_time
-                if self.solve(time_left=new_start_time) == -1:
-                    return -1
+                self.discrepancies += position
+                result = self.solve(time_left=new_start_time)
+                self.discrepancies -= position
+                if result != 0:
+                    return result
+            else:
+                self.varWeights[v] = self.varWeights.get( v, 0 ) + 1
+                # The rest of a replay lies below the value just refuted
+                self.replay = []
 
-            # If this assignment succeeded, return
-            if self.hassolution:
+            # If enough solutions were found, return
+            if self.solutionCount >= self.solutionLimit:
                 return 0
 
             # Otherwise backtrack
             self.trail.undo()
+            frame[1].pop( 0 )
+            position += 1
+
+            # Give up on this run once the restart cutoff is reached
+            if self.backtrackLimit != None and self.trail.getUndoCount() - self.runStartUndos >= self.backtrackLimit:
+                self.cutoffReached = True
+                return RESTART_CUTOFF
         
         return 0
 
+    """
+        Writes the search frontier to checkpointPath as JSON: the board and
+        flags it was started with, the solutions found so far and the
+        decision stack. The file is replaced atomically, so a process killed
+        while writing leaves the previous checkpoint intact.
+    """
+    def writeCheckpoint ( self ):
+        checkpoint = {
+            "board"         : self.gameboard.toText(),
+            "flags"         : self.checkpointFlags,
+            "solutionLimit" : self.solutionLimit,
+            "solutions"     : [ b.toText() for b in self.solutions ],
+            "frames"        : [ [ index, list( values ) ] for index, values in self.frames + self.replay ],
+        }
+        temp = self.checkpointPath + ".tmp"
+        with open( temp, "w" ) as f:
+            json.dump( checkpoint, f )
+            f.flush()
+            os.fsync( f.fileno() )
+        os.replace( temp, self.checkpointPath )
+        self.lastCheckpoint = time.time()
+
+    """
+        Loads a checkpoint written by writeCheckpoint for the same board and
+        flags. The next call to solve re-enters its decisions in order and
+        then carries on with the values each level had left.
+    """
+    def loadCheckpoint ( self, checkpoint ):
+        self.solutionLimit = checkpoint["solutionLimit"]
+        self.solutions = [ SudokuBoard.SudokuBoard( text=t ) for t in checkpoint["solutions"] ]
+        self.solutionCount = len( self.solutions )
+        self.hassolution = self.solutionCount > 0
+        self.restoredSolutions = set( checkpoint["solutions"] )
+        self.replay = [ ( index, list( values ) ) for index, values in checkpoint["frames"] ]
+
+    """
+        Keeps searching after a solution until limit solutions are found or
+        the search space is exhausted. A limit of 2 is enough to tell whether
+        the solution is unique.
+
+        Return: the number of solutions found. They are kept in self.solutions.
+    """
+    def countSolutions ( self, limit=2, time_left=600 ):
+        self.solutionLimit = limit
+        self.solve( time_left=time_left )
+        return self.solutionCount
+
+    """
+        Searches in runs of increasing backtrack cutoffs. Each run starts from
+        the root with randomized tie-breaking; the cutoff of run i is
+        restartBase times the i-th term of the Luby sequence (1, 1, 2, 1, 1,
+        2, 4, ...) or, with the "geometric" schedule, restartBase times
+        restartFactor^(i-1). Learned variable weights carry over between
+        runs.
+
+        Return: like solve, 0 when the search finished and -1 on timeout
+    """
+    def solveWithRestarts ( self, time_left=600 ):
+        start_time = time.time()
+        self.randomize = True
+        run = 0
+
+        while True:
+            run += 1
+            if self.restartSchedule == "geometric":
+                self.backtrackLimit = int( self.restartBase * self.restartFactor ** (run-1) )
+            else:
+                self.backtrackLimit = self.restartBase * self.luby( run )
+            self.runStartUndos = self.trail.getUndoCount()
+            self.cutoffReached = False
+
+            depth = len( self.trail.trailMarker )
+            self.trail.placeTrailMarker()
+            result = self.solve( time_left=time_left - (time.time() - start_time) )
+            if self.hassolution:
+                self.backtrackLimit = None
+                return 0
+
+            # Back to the root for the next run, which is not a backtrack
+            while len( self.trail.trailMarker ) > depth:
+                self.trail.restore()
+            if not self.cutoffReached:
+                self.backtrackLimit = None
+                return result
+            self.restarts += 1
+
+    """
+        Limited discrepancy search: runs solve from the root with a
+        discrepancy limit of 0, 1, 2, ... so that paths that mostly follow
+        the value ordering are tried first. The search is complete once an
+        iteration finishes without the limit cutting anything off.
+
+        Return: like solve, 0 when the search finished and -1 on timeout
+    """
+    def solveLDS ( self, time_left=600 ):
+        start_time = time.time()
+        limit = 0
+
+        while True:
+            self.discrepancyLimit = limit
+            self.discrepancyCut = False
+            self.discrepancies = 0
+            self.discrepancyIterations += 1
+
+            depth = len( self.trail.trailMarker )
+            self.trail.placeTrailMarker()
+            result = self.solve( time_left=time_left - (time.time() - start_time) )
+            if self.hassolution:
+                self.discrepancyLimit = None
+                return 0
+
+            # Back to the root for the next iteration, which is not a backtrack
+            while len( self.trail.trailMarker ) > depth:
+                self.trail.restore()
+            if result != 0 or not self.discrepancyCut:
+                self.discrepancyLimit = None
+                return result
+            limit += 1
+
+    # Returns the i-th term (from 1) of the Luby sequence
+    def luby ( self, i ):
+        while True:
+            k = 1
+            while (1 << k) - 1 < i:
+                k += 1
+            if (1 << k) - 1 == i:
+                return 1 << (k-1)
+            i -= (1 << (k-1)) - 1
+
+    # Runs the configured check, then any stacked propagators to a fixpoint
     def checkConsistency ( self ):
+        while True:
+            # Propagation before the search starts can be long too
+            now = time.time()
+            if now - self.lastPoll >= self.pollInterval:
+                self.poll( now )
+            if self.cancelled:
+                return False
+
+            if not self.baseConsistencyCheck():
+                return False
+
+            changed = False
+            if self.subsetOrder >= 2:
+                reduced, consistent = self.subsetCheck()
+                if not consistent:
+                    return False
+                changed = changed or reduced
+
+            if self.intersections:
+                reduced, consistent = self.intersectionCheck()
+                if not consistent:
+                    return False
+                changed = changed or reduced
+
+            # Probing is the most expensive, so it only runs at a fixpoint
+            if not changed and self.shouldProbe():
+                changed, consistent = self.probeCheck()
+                if not consistent:
+                    return False
+
+            if not changed:
+                return True
+
+    def baseConsistencyCheck ( self ):
         if self.cChecks == "forwardChecking":
             return self.forwardChecking()[1]
 
@@ -398,6 +1396,15 @@ class BTSolver:
         if self.cChecks == "tournCC":
             return self.getTournCC()
 
+        if self.cChecks == "adaptive":
+            return self.adaptiveCheck()
+
+        if self.cChecks == "gacCheck":
+            return self.gacCheck()
+
+        if self.cChecks == "bitCheck":
+            return self.bitCheck()
+
         else:
             return self.assignmentsCheck()
 
@@ -411,18 +1418,34 @@ class BTSolver:
         if self.varHeuristics == "tournVar":
             return self.getTournVar()
 
+        if self.varHeuristics == "domWdeg":
+            return self.getDomWdeg()
+
         else:
             return self.getfirstUnassignedVariable()
 
     def getNextValues ( self, v ):
         if self.valHeuristics == "LeastConstrainingValue":
-            return self.getValuesLCVOrder( v )
+            values = self.getValuesLCVOrder( v )
 
-        if self.valHeuristics == "tournVal":
-            return self.getTournVal( v )
+        elif self.valHeuristics == "tournVal":
+            values = self.getTournVal( v )
 
         else:
-            return self.getValuesInOrder( v )
+            values = self.getValuesInOrder( v )
+
+        if self.warmStart != None:
+            values = self.preferWarmStart( v, values )
+        return values
+
+    # Moves v's value in the warm start board, if still possible, to the front
+    def preferWarmStart ( self, v, values ):
+        value = self.warmStart[v.row][v.col]
+        if value not in values:
+            return values
+        return [ value ] + [ x for x in values if x != value ]
 
     def getSolution ( self ):
+        if self.solutions:
+            return self.solutions[0]
         return self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q)
\ No newline at end of file
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import collections
+import multiprocessing
+import multiprocessing.connection
+import SudokuBoard
+import SolverServer
+import MetricsExporter
+
+"""
+    Resumable batch runs. Every board's result is appended to a journal as
+    one JSON line, with the same fields as a SolverServer reply plus
+    "board". Boards already in the journal are skipped, so an interrupted
+    run continues where it stopped when started again with the same
+    journal.
+
+    Usage: python3 BatchRunner.py JOURNAL=path DIR_OR_BOARD... [FLAGS...] [TIMEOUT=s] [WORKERS=n] [METRICS=target]
+
+    FLAGS are Main.py flags. Boards are solved in worker processes. A
+    worker that is still busy GRACE seconds after the per-board TIMEOUT is
+    killed and replaced, and the board is journaled as a timeout. A worker
+    that dies is journaled as an error. Boards are identified by their path
+    as listed from the arguments. METRICS exports live progress as in
+    Main.py, see MetricsExporter.
+"""
+
+DEFAULT_TIME_LIMIT = 60
+
+# Extra time given to a worker to stop on its own before it is killed
+GRACE = 2
+
+# ==================================================================
+# Journal
+# ==================================================================
+
+# Returns the boards recorded in a journal, ignoring a torn last line
+def readJournal ( path ):
+    done = set()
+    if not os.path.exists( path ):
+        return done
+    with open( path ) as f:
+        for line in f:
+            try:
+                done.add( json.loads( line )["board"] )
+            except ( ValueError, KeyError ):
+                pass
+    return done
+
+"""
+    Cuts a torn last line off the journal. Otherwise the next result would
+    be appended to the fragment and be lost along with it.
+"""
+def repairJournal ( path ):
+    if not os.path.exists( path ):
+        return
+    with open( path, "rb+" ) as f:
+        end = f.seek( 0, os.SEEK_END )
+        pos = end
+        while pos > 0:
+            step = min( 4096, pos )
+            f.seek( pos - step )
+            i = f.read( step ).rfind( b"\n" )
+            if i >= 0:
+                pos = pos - step + i + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate( pos )
+            f.flush()
+            os.fsync( f.fileno() )
+
+# Appends one result to the journal and makes sure it reached the disk
+def appendJournal ( journal, result ):
+    journal.write( json.dumps( result ) + "\n" )
+    journal.flush()
+    os.fsync( journal.fileno() )
+
+# ==================================================================
+# Workers
+# ==================================================================
+
+# Worker process: solves the boards it is sent until it receives None
+def workerLoop ( conn, flags, timeLimit ):
+    while True:
+        board = conn.recv()
+        if board == None:
+            return
+        with open( board ) as f:
+            text = f.read()
+        conn.send( SolverServer.solveText( text, flags, timeLimit ) )
+
+class Worker:
+
+    def __init__ ( self, flags, timeLimit ):
+        self.flags = flags
+        self.timeLimit = timeLimit
+        self.board = None
+        self.started = None
+        self.start()
+
+    def start ( self ):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process( target=workerLoop, args=( child, self.flags, self.timeLimit ), daemon=True )
+        self.process.start()
+        child.close()
+
+    # Kills a stuck or dead worker and starts a fresh one
+    def restart ( self ):
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.start()
+
+    def assign ( self, board ):
+        self.board = board
+        self.started = time.time()
+        self.conn.send( board )
+
+    def deadline ( self ):
+        return self.started + self.timeLimit + GRACE
+
+    def stop ( self ):
+        try:
+            self.conn.send( None )
+        except OSError:
+            pass
+        self.process.join( GRACE )
+        if self.process.is_alive():
+            self.process.terminate()
+
+# ==================================================================
+# Runner
+# ==================================================================
+
+"""
+    Solves every board not yet in the journal, appending each result.
+
+    Return: a Counter of the statuses of the boards solved in this run
+"""
+def runBatch ( boards, journalPath, flags, timeLimit, workers, metrics = None ):
+    done = readJournal( journalPath )
+    pending = collections.deque( b for b in boards if b not in done )
+    statuses = collections.Counter()
+    if not pending:
+        return statuses
+
+    pool = [ Worker( flags, timeLimit ) for i in range( min( workers, len(pending) ) ) ]
+    repairJournal( journalPath )
+    with open( journalPath, "a" ) as journal:
+        try:
+            while True:
+                for w in pool:
+                    if w.board == None and pending:
+                        w.assign( pending.popleft() )
+                        if metrics != None:
+                            metrics.boardStarted( w.board )
+
+                busy = [ w for w in pool if w.board != None ]
+                if not busy:
+                    break
+
+                wait = max( 0, min( w.deadline() for w in busy ) - time.time() )
+                ready = multiprocessing.connection.wait( [ w.conn for w in busy ], wait )
+
+                for w in busy:
+                    if w.conn in ready:
+                        try:
+                            result = w.conn.recv()
+                        except ( EOFError, OSError ):
+                            result = { "status" : "error", "error" : "worker died", "time" : time.time() - w.started }
+                            w.restart()
+                    elif time.time() > w.deadline():
+                        result = { "status" : "timeout", "time" : time.time() - w.started }
+                        w.restart()
+                    else:
+                        continue
+
+                    result["board"] = w.board
+                    appendJournal( journal, result )
+                    statuses[result["status"]] += 1
+                    if metrics != None:
+                        metrics.boardFinished( w.board, result["status"] == "solved", result.get( "backtracks", 0 ) )
+                    print( "{} {} {:.2f}s".format( w.board, result["status"], result["time"] ) )
+                    w.board = None
+        finally:
+            for w in pool:
+                if w.board != None:
+                    w.process.terminate()
+                w.stop()
+
+    return statuses
+
+def main ( ):
+    journalPath = None
+    boards = []
+    flags = []
+    timeLimit = DEFAULT_TIME_LIMIT
+    workers = os.cpu_count()
+    metricsTarget = None
+
+    for arg in sys.argv[1:]:
+        if arg.startswith("JOURNAL="):
+            journalPath = arg[len("JOURNAL="):]
+        elif arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg.startswith("WORKERS="):
+            workers = int( arg[len("WORKERS="):] )
+        elif arg.startswith("METRICS="):
+            metricsTarget = arg[len("METRICS="):]
+        elif os.path.exists( arg ):
+            boards.extend( SudokuBoard.listBoards( arg ) )
+        else:
+            flags.append( arg )
+
+    if journalPath == None or not boards:
+        print( "Usage: BatchRunner JOURNAL=path DIR_OR_BOARD... [FLAGS...] [TIMEOUT=s] [WORKERS=n] [METRICS=target]" )
+        return
+
+    metrics = None
+    if metricsTarget != None:
+        metrics = MetricsExporter.MetricsExporter( metricsTarget, boardsTotal=len(boards) )
+        metrics.start()
+    try:
+        statuses = runBatch( boards, journalPath, flags, timeLimit, workers, metrics )
+    finally:
+        if metrics != None:
+            metrics.stop()
+    skipped = len(boards) - sum( statuses.values() )
+    print( "Boards: " + str(len(boards)) + " (" + str(skipped) + " already in journal)" )
+    for status in sorted( statuses ):
+        print( status.capitalize() + ": " + str(statuses[status]) )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import time
+import tempfile
+import SudokuBoard
+import Trail
+import Main
+import PuzzleGenerator
+
+"""
+    Runs a matrix of heuristic configurations over board directories and
+    reports, for each directory and configuration, how many boards were
+    solved, the total and worst solve time and the total backtracks.
+
+    Usage: python3 Benchmark.py DIR [DIR ...] [CONFIG="MRV LCV FC"]... [TIMEOUT=s]
+           python3 Benchmark.py STRESS=6x6,7x7,8x8 [BOARDS=n] [GIVENS=f] [SEED=s] [CONFIG=...]... [TIMEOUT=s]
+
+    Each CONFIG is a set of Main.py flags; without any, DEFAULT_CONFIGS is
+    used. TIMEOUT is the per-board limit in seconds.
+
+    A configuration with SAC is also compared with the same flags without
+    probing, which is run as well if it is not one of the configurations,
+    to show the backtracks probing avoided and the time it cost.
+
+    STRESS generates BOARDS boards of each p x q shape (36x36, 49x49 and
+    64x64 for the example above) with a fraction GIVENS of the cells given,
+    without checking uniqueness, writes them to a temporary directory and benchmarks them like a DIR.
+"""
+
+DEFAULT_CONFIGS = [
+    "MRV LCV FC",
+    "MAD LCV FC",
+    "WDEG LCV FC",
+    "MRV LCV NOR",
+    "MAD LCV NOR",
+    "WDEG LCV NOR",
+]
+
+DEFAULT_TIME_LIMIT = 60
+
+DEFAULT_STRESS_BOARDS = 3
+DEFAULT_STRESS_GIVENS = 0.65
+
+# Generates the stress boards of each shape, returning one directory per shape
+def generateStressBoards ( shapes, numBoards, givens, seed, baseDir ):
+    paths = []
+    for shape in shapes:
+        p, q = [ int(x) for x in shape.lower().split( "x" ) ]
+        N = p*q
+        path = os.path.join( baseDir, str(N) + "x" + str(N) )
+        os.makedirs( path, exist_ok=True )
+        for i in range( numBoards ):
+            sudokudata = PuzzleGenerator.generateBoard( p, q, int( givens * N*N ), seed + i, unique=False )
+            with open( os.path.join( path, "board_" + str(i) + ".txt" ), "w" ) as f:
+                f.write( sudokudata.toText() )
+        paths.append( path )
+    return paths
+
+# Solves one board with the given flags and returns its statistics
+def runBoard ( filepath, flags, timeLimit ):
+    file, var_sh, val_sh, cc, options = Main.parseArgs( flags.split() )
+    sudokudata = SudokuBoard.SudokuBoard( filepath=filepath )
+    trail = Trail.Trail()
+    pushes = trail.getPushCount()
+    undos = trail.getUndoCount()
+
+    start = time.time()
+    solver = Main.solveBoard( sudokudata, trail, val_sh, var_sh, cc, options, deadline=start + timeLimit )
+
+    return {
+        "board"      : filepath,
+        "solved"     : solver.hassolution,
+        "time"       : time.time() - start,
+        "pushes"     : trail.getPushCount() - pushes,
+        "backtracks" : trail.getUndoCount() - undos,
+    }
+
+# Runs one configuration over a list of boards
+def runConfig ( boards, flags, timeLimit ):
+    return [ runBoard( b, flags, timeLimit ) for b in boards ]
+
+# Sums the per-board results of one configuration
+def summarize ( results ):
+    return {
+        "boards"     : len(results),
+        "solved"     : sum( 1 for r in results if r["solved"] ),
+        "time"       : sum( r["time"] for r in results ),
+        "maxTime"    : max( [ r["time"] for r in results ] + [0] ),
+        "backtracks" : sum( r["backtracks"] for r in results ),
+        "pushes"     : sum( r["pushes"] for r in results ),
+    }
+
+"""
+    Returns the flags of a configuration with probing (SAC or SAC=k) left
+    out, keeping the forward checking that probing implies, or None if the
+    configuration does not probe.
+"""
+def withoutProbing ( flags ):
+    args = flags.split()
+    stripped = [ a for a in args if a != "SAC" and not a.startswith("SAC=") ]
+    if len(stripped) == len(args):
+        return None
+    if Main.parseArgs( stripped )[3] == "" and Main.parseArgs( args )[3] != "":
+        stripped.append( "FC" )
+    return " ".join( stripped )
+
+# Prints how a configuration with probing compares with the same without it
+def printProbing ( flags, summary, baseline ):
+    print( "{:<24} {:<28} {} backtracks avoided by probing, {:+.2f}s".format(
+        "", flags, baseline["backtracks"] - summary["backtracks"], summary["time"] - baseline["time"] ) )
+
+def printSummary ( name, flags, summary ):
+    print( "{:<24} {:<28} {:>4}/{:<4} {:>9.2f}s {:>9.2f}s {:>11} {:>11}".format(
+        name, flags, summary["solved"], summary["boards"], summary["time"],
+        summary["maxTime"], summary["backtracks"], summary["pushes"] ) )
+
+def main ( ):
+    paths = []
+    configs = []
+    timeLimit = DEFAULT_TIME_LIMIT
+    shapes = []
+    numBoards = DEFAULT_STRESS_BOARDS
+    givens = DEFAULT_STRESS_GIVENS
+    seed = 0
+
+    for arg in sys.argv[1:]:
+        if arg.startswith("CONFIG="):
+            configs.append( arg[len("CONFIG="):] )
+        elif arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg.startswith("STRESS="):
+            shapes.extend( [ s for s in arg[len("STRESS="):].split( "," ) if s != "" ] )
+        elif arg.startswith("BOARDS="):
+            numBoards = int( arg[len("BOARDS="):] )
+        elif arg.startswith("GIVENS="):
+            givens = float( arg[len("GIVENS="):] )
+        elif arg.startswith("SEED="):
+            seed = int( arg[len("SEED="):] )
+        else:
+            paths.append( arg )
+
+    if not paths and not shapes:
+        print( "Usage: Benchmark DIR [DIR ...] [CONFIG=\"flags\"]... [TIMEOUT=s]" )
+        print( "       Benchmark STRESS=pxq[,pxq...] [BOARDS=n] [GIVENS=f] [SEED=s] [CONFIG=\"flags\"]... [TIMEOUT=s]" )
+        return
+
+    if shapes:
+        stressDir = tempfile.mkdtemp( prefix="sudoku_stress_" )
+        paths.extend( generateStressBoards( shapes, numBoards, givens, seed, stressDir ) )
+
+    if not configs:
+        configs = DEFAULT_CONFIGS
+
+    print( "{:<24} {:<28} {:>9} {:>10} {:>10} {:>11} {:>11}".format(
+        "Boards", "Flags", "Solved", "Time", "Worst", "Backtracks", "Pushes" ) )
+    for path in paths:
+        boards = SudokuBoard.listBoards( path )
+        name = os.path.basename( os.path.normpath( path ) )
+        summaries = dict()
+        for flags in configs:
+            summaries[flags] = summarize( runConfig( boards, flags, timeLimit ) )
+            printSummary( name, flags, summaries[flags] )
+
+        for flags in configs:
+            baseline = withoutProbing( flags )
+            if baseline == None:
+                continue
+            if baseline not in summaries:
+                summaries[baseline] = summarize( runConfig( boards, baseline, timeLimit ) )
+                printSummary( name, baseline, summaries[baseline] )
+            printProbing( flags, summaries[flags], summaries[baseline] )
+
+if __name__ == "__main__":
+    main()
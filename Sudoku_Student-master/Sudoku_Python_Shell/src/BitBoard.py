@@ -0,0 +1,135 @@
+"""
+    Whole-board view of the domains as one bit plane per value: bit i of
+    planes[d] is set iff cell i (row-major, as in Topology) still has d as a
+    candidate. With the unit masks of the Topology, questions such as
+    "where can d still go in this block" are a single AND instead of a walk
+    over the variables of a constraint.
+
+    The planes are kept in sync by the ConstraintNetwork, which passes on
+    every change its variables report (see Variable.markChanged). Undoing
+    the trail restores domains through the same path, so the planes follow
+    backtracking without being saved on the trail themselves.
+"""
+
+class BitBoard:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, network ):
+        self.topology = network.topology
+        self.N = network.N
+        self.index = { v : i for i, v in enumerate(network.variables) }
+
+        self.planes = [ 0 ] * (self.N+1)
+        # Cells with exactly one candidate, and with none
+        self.singles = 0
+        self.empty = 0
+
+        # Domain of every cell as a value mask, as last seen
+        self.cellMasks = [ 0 ] * len(network.variables)
+        for v in network.variables:
+            self.variableChanged( v )
+
+    # ==================================================================
+    # Synchronization
+    # ==================================================================
+
+    # Updates the planes from the new domain of v
+    def variableChanged ( self, v ):
+        i = self.index[v]
+        bit = 1 << i
+        mask = 0
+        for val in v.getValues():
+            mask |= 1 << val
+
+        diff = self.cellMasks[i] ^ mask
+        if diff == 0:
+            return
+        self.cellMasks[i] = mask
+
+        while diff:
+            low = diff & -diff
+            self.planes[low.bit_length() - 1] ^= bit
+            diff ^= low
+
+        size = v.size()
+        self.singles = self.singles | bit if size == 1 else self.singles & ~bit
+        self.empty = self.empty | bit if size == 0 else self.empty & ~bit
+
+    # ==================================================================
+    # Queries
+    # ==================================================================
+
+    """
+        Checks, for every unit and value, that the value still has a place
+        and is not the only candidate of two cells, and that no cell has an
+        empty domain.
+
+        Return: true if no unit is violated
+    """
+    def isConsistent ( self ):
+        if self.empty:
+            return False
+        for d in range( 1, self.N+1 ):
+            plane = self.planes[d]
+            fixed = plane & self.singles
+            for unit in self.topology.unitMasks:
+                if plane & unit == 0:
+                    return False
+                placed = fixed & unit
+                if placed & (placed - 1):
+                    return False
+        return True
+
+    # Returns (cell index, value) for every value with a single place in
+    # some unit, in a cell that still has other candidates
+    def hiddenSingles ( self ):
+        singles = []
+        for d in range( 1, self.N+1 ):
+            plane = self.planes[d] & ~self.singles
+            if plane == 0:
+                continue
+            for unit in self.topology.unitMasks:
+                places = self.planes[d] & unit
+                if places and places & (places - 1) == 0 and places & plane:
+                    singles.append( ( places.bit_length() - 1, d ) )
+        return singles
+
+    """
+        Intersection removal over all blocks and lines at once: a value
+        whose places in a block all lie in one line is removed from the rest
+        of that line (pointing), and one whose places in a line all lie in
+        one block is removed from the rest of the block (box-line
+        reduction).
+
+        Return: a list of (mask of cells, value) to remove
+    """
+    def intersectionRemovals ( self ):
+        removals = []
+        for d in range( 1, self.N+1 ):
+            plane = self.planes[d]
+            for overlap, blockRest, lineRest in self.topology.intersectionMasks:
+                if plane & overlap == 0:
+                    continue
+                inBlockRest = plane & blockRest
+                inLineRest = plane & lineRest
+                if inBlockRest == 0 and inLineRest:
+                    removals.append( ( inLineRest, d ) )
+                elif inLineRest == 0 and inBlockRest:
+                    removals.append( ( inBlockRest, d ) )
+        return removals
+
+# ==================================================================
+# Helpers
+# ==================================================================
+
+# Returns the indices of the set bits of mask, lowest first
+def cellsOf ( mask ):
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append( low.bit_length() - 1 )
+        mask ^= low
+    return cells
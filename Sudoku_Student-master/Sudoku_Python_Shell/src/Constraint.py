@@ -14,6 +14,9 @@ class Constraint:
     def __init__ ( self ):
         self.vars = []
 
+        # Conflict weight used by the dom/wdeg heuristic
+        self.weight = 1
+
     # ==================================================================
     # Modifiers
     # ==================================================================
@@ -42,16 +45,15 @@ class Constraint:
 
     # Returns true if constraint is consistent, false otherwise
     def isConsistent ( self ):
+        assignments = set()
         for var in self.vars:
             if not var.isAssigned():
                 continue
 
-            for otherVar in self.vars:
-                if var == otherVar:
-                    continue
-
-                if otherVar.isAssigned() and otherVar.getAssignment() == var.getAssignment():
-                    return False
+            value = var.getAssignment()
+            if value in assignments:
+                return False
+            assignments.add( value )
 
         return True
 
@@ -1,7 +1,8 @@
 import Variable
 import Constraint
 import SudokuBoard
-from math import floor
+import Topology
+import BitBoard
 
 """
     CSP representation of the problem. Contains the variables, constraints, and
@@ -16,80 +17,121 @@ class ConstraintNetwork:
     def __init__ ( self, sboard = None ):
         self.constraints = []
         self.variables = []
+        self.variableSet = set()
+        self.constraintSet = set()
+        self.constraintsOf = dict()
+        self.neighbors = dict()
+        self.topology = None
+        self.N = 0
 
-        if sboard != None:
-            board = sboard.board
-            temp = []
-            value = 0
-
-            for i in range(sboard.N):
-                for j in range(sboard.N):
-                    value = board[i][j]
-                    domain = []
-                    if value == 0:
-                        d = 1
-                        while d <= sboard.N:
-                            domain.append(d)
-                            d += 1
-                    else:
-                        domain.append(value)
-
-                    block = int(((floor(i/sboard.p) * sboard.p) + floor(j/sboard.q)))
-                    temp.append(Variable.Variable(domain,i,j,block))
-
-            rows = dict()
-            cols = dict()
-            blocks = dict()
-
-            for v in temp:
-                row = v.row
-                col = v.col
-                block = v.block
-
-                if not (row in rows.keys()):
-                    rows[row] = []
-                if not (col in cols.keys()):
-                    cols[col] = []
-                if not (block in blocks.keys()):
-                    blocks[block] = []
-
-                rows[row].append(v)
-                cols[col].append(v)
-                blocks[block].append(v)
-
-            for v in temp:
-                self.addVariable(v)
-
-            for e in rows:
-                c = Constraint.Constraint()
-                for v in rows[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
+        # Support counts, see enableSupportCounts
+        self.supportCounts = None
+        self.assignedCounts = None
+        self.supportMasks = dict()
 
-            for e in cols:
-                c = Constraint.Constraint()
-                for v in cols[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
+        # Value planes of the whole board, see enableBitBoard
+        self.bitBoard = None
 
-            for e in blocks:
+        if sboard != None:
+            board = sboard.board
+            N = sboard.N
+            self.N = N
+            self.topology = Topology.Topology.get( sboard.p, sboard.q )
+            fullDomain = list( range( 1, N+1 ) )
+
+            # Only the givens differ between boards of the same shape
+            for index, cell in enumerate(self.topology.cells):
+                value = board[cell[0]][cell[1]]
+                domain = [value] if value != 0 else list( fullDomain )
+                self.addVariable( Variable.Variable( domain, cell[0], cell[1], cell[2] ) )
+
+            for unit in self.topology.units:
                 c = Constraint.Constraint()
-                for v in blocks[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
+                for index in unit:
+                    c.addVariable( self.variables[index] )
+                self.addConstraint( c )
 
     # ==================================================================
     # Modifiers
     # ==================================================================
 
     def addConstraint ( self, c ):
-        if c not in self.constraints:
+        if c not in self.constraintSet:
+            self.constraintSet.add( c )
             self.constraints.append( c )
+            for v in c.vars:
+                self.constraintsOf.setdefault( v, [] ).append( c )
+                self.neighbors.pop( v, None )
 
     def addVariable ( self, v ):
-        if v not in self.variables:
+        if v not in self.variableSet:
+            self.variableSet.add( v )
             self.variables.append( v )
 
+    """
+        Starts keeping, for every variable v and value d,
+            supportCounts[v][d]:  how many unassigned neighbors of v still
+                                  have d in their domain
+            assignedCounts[v][d]: how many assigned neighbors of v hold d
+        The variables report every change to the network, which updates the
+        counts of the neighbors from the difference with the last state it
+        saw, so changes undone through the trail are undone here as well.
+    """
+    def enableSupportCounts ( self ):
+        if self.supportCounts != None:
+            return
+
+        N = self.N
+        for v in self.variables:
+            N = max( [N] + v.getValues() )
+
+        self.supportCounts = dict()
+        self.assignedCounts = dict()
+        for v in self.variables:
+            self.supportCounts[v] = [0] * (N+1)
+            self.assignedCounts[v] = [0] * (N+1)
+
+        for v in self.variables:
+            self.supportMasks[v] = ( 0, 0 )
+            v.observer = self
+            self.variableChanged( v )
+
+    # Starts keeping a BitBoard of the domains, updated on every change
+    def enableBitBoard ( self ):
+        if self.bitBoard != None or self.topology == None:
+            return
+        self.bitBoard = BitBoard.BitBoard( self )
+        for v in self.variables:
+            v.observer = self
+
+    # Updates the bit board and the support counts of v's neighbors after v changed
+    def variableChanged ( self, v ):
+        if self.bitBoard != None:
+            self.bitBoard.variableChanged( v )
+
+        if self.supportCounts == None:
+            return
+
+        mask = 0
+        for val in v.getValues():
+            mask |= 1 << val
+        new = ( 0, mask ) if v.isAssigned() else ( mask, 0 )
+        old = self.supportMasks[v]
+        if new == old:
+            return
+        self.supportMasks[v] = new
+
+        for counts, before, after in [ ( self.supportCounts, old[0], new[0] ), ( self.assignedCounts, old[1], new[1] ) ]:
+            diff = before ^ after
+            val = 0
+            while diff:
+                if diff & 1:
+                    step = 1 if after >> val & 1 else -1
+                    for n in self.getNeighborsOfVariable( v ):
+                        counts[n][val] += step
+                diff >>= 1
+                val += 1
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -102,15 +144,22 @@ class ConstraintNetwork:
 
     # Returns all variables that share a constraint with v
     def getNeighborsOfVariable ( self, v ):
-        neighbors = set()
+        if v not in self.neighbors:
+            if self.topology != None:
+                peers = self.topology.peers[self.topology.index( v.row, v.col )]
+                self.neighbors[v] = [ self.variables[i] for i in peers ]
+                return self.neighbors[v]
 
-        for c in self.constraints:
-            if c.contains( v ):
+            neighbors = set()
+
+            for c in self.getConstraintsContainingVariable( v ):
                 for x in c.vars:
                     neighbors.add( x )
 
-        neighbors.remove( v )
-        return list( neighbors )
+            neighbors.remove( v )
+            self.neighbors[v] = list( neighbors )
+
+        return self.neighbors[v]
 
     # Returns true is every constraint is consistent
     def isConsistent ( self ):
@@ -126,11 +175,7 @@ class ConstraintNetwork:
             @param v variable to check
             @return list of constraints that contains v
         """
-        outList = []
-        for c in self.constraints:
-            if c.contains( v ):
-                outList.append( c )
-        return outList
+        return self.constraintsOf.get( v, [] )
 
     """
         Returns the constraints that contain variables whose domains were
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import socket
+import multiprocessing
+import SudokuBoard
+import Trail
+import BTSolver
+import Main
+import SolverServer
+
+"""
+    Cube-and-conquer over a shared directory, for boards too large for one
+    machine. The only thing the nodes share is the filesystem.
+
+    SPLIT searches the board with the given flags down to DEPTH decisions
+    and writes every consistent node reached as a self-contained board file
+    (a "cube": the givens plus the decisions and what propagation assigned)
+    to DIR/cubes, with the flags in DIR/job.json. Branches propagation
+    refutes are dropped, and a solution found while splitting is written
+    straight away.
+
+    WORK claims cubes by renaming them into DIR/claimed, which only one
+    worker can win, solves them with the job's flags and writes the outcome
+    to DIR/results. The first worker to solve a cube creates
+    DIR/solution.txt and DIR/STOP. Running searches poll for STOP and give
+    up once it appears, and workers exit when it exists or every cube has a
+    result.
+
+    COORDINATE waits until a solution appears, writing STOP, or until every
+    cube has a result, and prints the outcome. The board is only unsolvable
+    if every cube's search ran to the end; a cube that timed out leaves it
+    unknown. LOCAL does all of it on one host with WORKERS worker processes.
+
+    Usage: python3 CubeAndConquer.py SPLIT DIR BOARD [FLAGS...] [DEPTH=d]
+           python3 CubeAndConquer.py WORK DIR [TIMEOUT=s] [ID=name]
+           python3 CubeAndConquer.py COORDINATE DIR [TIMEOUT=s]
+           python3 CubeAndConquer.py LOCAL DIR BOARD [FLAGS...] [DEPTH=d] [WORKERS=n] [TIMEOUT=s]
+
+    A claimed cube sits in DIR/claimed as NAME.WORKER. If its worker dies,
+    the coordinator and idle workers move it back to DIR/cubes once it has
+    been claimed for longer than TIMEOUT plus GRACE seconds, so TIMEOUT
+    should be the same for every node and the filesystem must update the
+    change time on rename, as local POSIX filesystems and NFS do.
+"""
+
+DEFAULT_DEPTH = 4
+DEFAULT_TIME_LIMIT = 3600
+
+# Seconds between looks at the work directory
+POLL = 0.5
+
+# Time a cube may stay claimed past the time limit before it is put back
+GRACE = 60
+
+# ==================================================================
+# Work Directory
+# ==================================================================
+
+def paths ( workDir ):
+    return {
+        "job"      : os.path.join( workDir, "job.json" ),
+        "cubes"    : os.path.join( workDir, "cubes" ),
+        "claimed"  : os.path.join( workDir, "claimed" ),
+        "results"  : os.path.join( workDir, "results" ),
+        "solution" : os.path.join( workDir, "solution.txt" ),
+        "stop"     : os.path.join( workDir, "STOP" ),
+    }
+
+# Writes a file under a temporary name and renames it into place
+def writeAtomically ( path, text ):
+    tmp = path + "." + workerName() + ".tmp"
+    with open( tmp, "w" ) as f:
+        f.write( text )
+        f.flush()
+        os.fsync( f.fileno() )
+    os.replace( tmp, path )
+
+def workerName ( ):
+    return socket.gethostname() + "-" + str( os.getpid() )
+
+def stopRequested ( workDir ):
+    return os.path.exists( paths( workDir )["stop"] )
+
+def requestStop ( workDir ):
+    with open( paths( workDir )["stop"], "a" ):
+        pass
+
+"""
+    Publishes a solution unless another worker got there first. The file is
+    written aside and hard-linked into place, which fails if it exists.
+
+    Return: true if this solution is the one published
+"""
+def publishSolution ( workDir, text ):
+    target = paths( workDir )["solution"]
+    tmp = target + "." + workerName() + ".tmp"
+    with open( tmp, "w" ) as f:
+        f.write( text )
+        f.flush()
+        os.fsync( f.fileno() )
+    try:
+        os.link( tmp, target )
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove( tmp )
+        requestStop( workDir )
+
+# The cancel event of the searches: set once the STOP file exists
+class StopFile:
+
+    def __init__ ( self, workDir ):
+        self.workDir = workDir
+
+    def is_set ( self ):
+        return stopRequested( self.workDir )
+
+# ==================================================================
+# Splitting
+# ==================================================================
+
+# Walks the solver's search tree down to depth decisions, passing every
+# consistent node reached to emit
+def splitCubes ( solver, depth, emit ):
+    v = solver.selectNextVariable()
+    if v == None or depth == 0:
+        emit( solver.network.toSudokuBoard( solver.gameboard.p, solver.gameboard.q ), v == None )
+        return
+
+    for val in solver.getNextValues( v ):
+        solver.trail.placeTrailMarker()
+        solver.trail.push( v )
+        v.assignValue( val )
+        if solver.checkConsistency():
+            splitCubes( solver, depth - 1, emit )
+        solver.trail.undo()
+
+"""
+    Writes the cubes of a board to a fresh work directory.
+
+    Return: the number of cubes written
+"""
+def split ( workDir, sudokudata, flags, depth ):
+    # Leftovers of an earlier job would be taken for this one's
+    p = paths( workDir )
+    if os.path.exists( p["job"] ):
+        os.remove( p["job"] )
+    for d in [ p["cubes"], p["claimed"], p["results"] ]:
+        os.makedirs( d, exist_ok=True )
+        for f in os.listdir( d ):
+            os.remove( os.path.join( d, f ) )
+    for name in [ "solution", "stop" ]:
+        if os.path.exists( p[name] ):
+            os.remove( p[name] )
+
+    file, var_sh, val_sh, cc, options = Main.parseArgs( flags )
+    solver = BTSolver.BTSolver( sudokudata, Trail.Trail(), val_sh, var_sh, cc )
+    for name in Main.SOLVER_SETTINGS:
+        if name in options:
+            setattr( solver, name, options[name] )
+
+    cubes = []
+    def emit ( board, solved ):
+        if solved:
+            publishSolution( workDir, board.toText() )
+        else:
+            cubes.append( board.toText() )
+
+    if solver.checkConsistency():
+        splitCubes( solver, depth, emit )
+
+    width = len( str( len(cubes) ) )
+    for i, text in enumerate(cubes):
+        writeAtomically( os.path.join( p["cubes"], "cube_" + str(i).zfill( width ) + ".txt" ), text )
+    writeAtomically( p["job"], json.dumps( { "flags" : flags, "depth" : depth, "cubes" : len(cubes) } ) )
+    return len(cubes)
+
+# ==================================================================
+# Workers
+# ==================================================================
+
+# Claims the first free cube, returning its claimed path or None if none is left
+def claimCube ( workDir, name ):
+    p = paths( workDir )
+    for cube in sorted( os.listdir( p["cubes"] ) ):
+        claimed = os.path.join( p["claimed"], cube + "." + name )
+        try:
+            os.rename( os.path.join( p["cubes"], cube ), claimed )
+        except FileNotFoundError:
+            continue
+        return claimed
+    return None
+
+# Returns the number of cubes that have a result
+def countResults ( workDir ):
+    return sum( 1 for r in os.listdir( paths( workDir )["results"] ) if r.endswith( ".json" ) )
+
+"""
+    Puts cubes back up for grabs whose worker has had them for longer than
+    the time limit plus GRACE without writing a result, which means the
+    worker died. The claim's age is read from its change time, which the
+    rename into DIR/claimed sets; the modification time is still the one
+    of the split.
+
+    Return: the number of cubes put back
+"""
+def requeueStale ( workDir, timeLimit ):
+    p = paths( workDir )
+    requeued = 0
+    for claim in os.listdir( p["claimed"] ):
+        path = os.path.join( p["claimed"], claim )
+        cube = claim[:claim.index( ".txt" ) + len( ".txt" )]
+        try:
+            if time.time() - os.path.getctime( path ) < timeLimit + GRACE:
+                continue
+            if os.path.exists( os.path.join( p["results"], cube + ".json" ) ):
+                os.remove( path )
+                continue
+            os.rename( path, os.path.join( p["cubes"], cube ) )
+            requeued += 1
+        except FileNotFoundError:
+            continue
+    return requeued
+
+"""
+    Solves cubes until every cube has a result or a stop is requested. With
+    no free cube left it waits for the other workers, putting back the
+    cubes of any that died.
+
+    Return: the number of cubes this worker solved
+"""
+def work ( workDir, timeLimit = DEFAULT_TIME_LIMIT, name = None ):
+    if name == None:
+        name = workerName()
+    # job.json is written last, once every cube is in place
+    p = paths( workDir )
+    while not os.path.exists( p["job"] ):
+        time.sleep( POLL )
+    with open( p["job"] ) as f:
+        job = json.load( f )
+    flags = job["flags"]
+
+    done = 0
+    while not stopRequested( workDir ):
+        claimed = claimCube( workDir, name )
+        if claimed == None:
+            if countResults( workDir ) >= job["cubes"]:
+                break
+            if requeueStale( workDir, timeLimit ) == 0:
+                time.sleep( POLL )
+            continue
+        cube = os.path.basename( claimed )[:-len( "." + name )]
+        # A claim put back as stale in the meantime is someone else's now
+        try:
+            with open( claimed ) as f:
+                text = f.read()
+        except FileNotFoundError:
+            continue
+
+        result = SolverServer.solveText( text, flags, timeLimit, { "cancelEvent" : StopFile( workDir ) } )
+        result["cube"] = cube
+        result["worker"] = name
+        result["timeLimit"] = timeLimit
+        if result["status"] == "solved":
+            result["published"] = publishSolution( workDir, result["solution"] )
+        writeAtomically( os.path.join( p["results"], cube + ".json" ), json.dumps( result ) )
+        done += 1
+    return done
+
+# ==================================================================
+# Coordinator
+# ==================================================================
+
+# Whether a result proves its cube has no solution: the search ran to the
+# end within the time limit
+def isRefuted ( result ):
+    return result["status"] == "unsolvable" and result["time"] < result.get( "timeLimit", DEFAULT_TIME_LIMIT )
+
+"""
+    Waits for a solution or for every cube to have a result, then makes
+    sure the workers stop. Cubes whose worker died are put back meanwhile.
+
+    Return: a pair of the outcome (solved, unsolvable or unknown when some
+            cube timed out or failed) and the solution text or None
+"""
+def coordinate ( workDir, timeLimit = DEFAULT_TIME_LIMIT ):
+    p = paths( workDir )
+    while not os.path.exists( p["job"] ):
+        time.sleep( POLL )
+    with open( p["job"] ) as f:
+        numCubes = json.load( f )["cubes"]
+
+    while True:
+        if os.path.exists( p["solution"] ):
+            requestStop( workDir )
+            with open( p["solution"] ) as f:
+                return ( "solved", f.read() )
+
+        results = [ r for r in os.listdir( p["results"] ) if r.endswith( ".json" ) ]
+        if len(results) >= numCubes:
+            requestStop( workDir )
+            unrefuted = []
+            for r in results:
+                with open( os.path.join( p["results"], r ) ) as f:
+                    result = json.load( f )
+                if not isRefuted( result ):
+                    unrefuted.append( result["cube"] + " (" + result["status"] + ")" )
+            if unrefuted:
+                print( "Cubes not refuted: " + ", ".join( sorted( unrefuted ) ) )
+            return ( "unknown" if unrefuted else "unsolvable", None )
+
+        requeueStale( workDir, timeLimit )
+        time.sleep( POLL )
+
+def report ( outcome, solution ):
+    print( "Outcome: " + outcome )
+    if solution != None:
+        print( SudokuBoard.SudokuBoard( text=solution ) )
+
+# ==================================================================
+# Command Line
+# ==================================================================
+
+def main ( ):
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in [ "SPLIT", "WORK", "COORDINATE", "LOCAL" ]:
+        print( "Usage: CubeAndConquer SPLIT|WORK|COORDINATE|LOCAL DIR [BOARD] [FLAGS...] [DEPTH=d] [WORKERS=n] [TIMEOUT=s] [ID=name]" )
+        return
+
+    mode, workDir = args[0], args[1]
+    board = None
+    flags = []
+    depth = DEFAULT_DEPTH
+    workers = os.cpu_count()
+    timeLimit = DEFAULT_TIME_LIMIT
+    name = None
+
+    for arg in args[2:]:
+        if arg.startswith("DEPTH="):
+            depth = int( arg[len("DEPTH="):] )
+        elif arg.startswith("WORKERS="):
+            workers = int( arg[len("WORKERS="):] )
+        elif arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg.startswith("ID="):
+            name = arg[len("ID="):]
+        elif board == None and os.path.isfile( arg ):
+            board = arg
+        else:
+            flags.append( arg )
+
+    if mode in [ "SPLIT", "LOCAL" ]:
+        if board == None:
+            print( "[ERROR] No board given." )
+            return
+        start = time.time()
+        numCubes = split( workDir, SudokuBoard.SudokuBoard( filepath=board ), flags, depth )
+        print( "Cubes: {} ({:.2f}s)".format( numCubes, time.time() - start ) )
+
+    if mode == "WORK":
+        print( "Cubes solved: " + str( work( workDir, timeLimit, name ) ) )
+
+    elif mode == "COORDINATE":
+        report( *coordinate( workDir, timeLimit ) )
+
+    elif mode == "LOCAL":
+        start = time.time()
+        pool = [ multiprocessing.Process( target=work, args=( workDir, timeLimit, "local" + str(i) ) ) for i in range(workers) ]
+        for w in pool:
+            w.start()
+        outcome = coordinate( workDir, timeLimit )
+        for w in pool:
+            w.join()
+        report( *outcome )
+        print( "Time: {:.2f}s".format( time.time() - start ) )
+
+if __name__ == "__main__":
+    main()
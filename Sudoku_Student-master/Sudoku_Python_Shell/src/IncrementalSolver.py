@@ -0,0 +1,191 @@
+import time
+import SudokuBoard
+import BTSolver
+import Trail
+
+"""
+    A live solver for boards that are edited one clue at a time, such as in
+    an interactive editor.
+
+    The network is built once for an empty board and every clue is applied
+    on top of it as its own layer on the trail: a trail marker, the
+    assignment and its propagation. Removing a clue undoes the layers from
+    that clue up and re-applies the clues that were added after it, so the
+    propagation of older clues is kept. Searches run in a further layer
+    that is undone afterwards, with the previous solution tried first.
+    Retracting layers is not counted as backtracking.
+
+    Layers are retracted in the order they were added, so the cost of
+    removing a clue grows with the number of clues added after it: removing
+    the most recent clue is one undo, removing the first one re-applies and
+    propagates every other clue. Editors that mostly change recent clues
+    get the most out of this.
+
+    A solution stays valid while every clue agrees with it, which is known
+    without any search; removing a clue never invalidates it.
+
+        solver = IncrementalSolver( SudokuBoard.SudokuBoard( filepath=f ) )
+        solver.addClue( 0, 4, 7 )
+        solution = solver.solve()      # SudokuBoard, or None if unsolvable
+        solver.removeClue( 0, 4 )
+"""
+
+class IncrementalSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, gb, var_sh = "MinimumRemainingValue", val_sh = "", cc = "forwardChecking" ):
+        self.p = gb.p
+        self.q = gb.q
+        self.N = gb.N
+
+        empty = [[ 0 for j in range(self.N) ] for i in range(self.N)]
+        self.trail = Trail.Trail()
+        self.solver = BTSolver.BTSolver( SudokuBoard.SudokuBoard( self.p, self.q, board=empty ), self.trail, val_sh, var_sh, cc )
+        self.network = self.solver.network
+
+        # Clues in the order they were added, as (row, col, value). The
+        # first applied of them have a layer on the trail; the rest wait
+        # behind a clue that made the board inconsistent.
+        self.clues = []
+        self.applied = 0
+        self.consistent = True
+
+        # Last solution found, how many clues disagree with it, and whether
+        # the current clues are known to have no solution
+        self.solution = None
+        self.conflicts = 0
+        self.unsolvable = False
+
+        # Statistics
+        self.searches = 0
+        self.cacheHits = 0
+
+        for i in range(self.N):
+            for j in range(self.N):
+                if gb.board[i][j] != 0:
+                    self.addClue( i, j, gb.board[i][j] )
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Returns the value of the clue at a cell, or 0 if there is none
+    def getClue ( self, row, col ):
+        for r, c, value in self.clues:
+            if r == row and c == col:
+                return value
+        return 0
+
+    # Returns the current clues as a board
+    def toSudokuBoard ( self ):
+        board = [[ 0 for j in range(self.N) ] for i in range(self.N)]
+        for row, col, value in self.clues:
+            board[row][col] = value
+        return SudokuBoard.SudokuBoard( self.p, self.q, board=board )
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Sets the clue at a cell, replacing any clue it had
+    def addClue ( self, row, col, value ):
+        if self.getClue( row, col ) == value:
+            return
+        self.removeClue( row, col )
+
+        self.clues.append( ( row, col, value ) )
+        if self.solution != None and self.solution.board[row][col] != value:
+            self.conflicts += 1
+
+        if self.consistent:
+            self.consistent = self.applyClue( len(self.clues) - 1 )
+
+    # Removes the clue at a cell, if any
+    def removeClue ( self, row, col ):
+        index = None
+        for i, clue in enumerate(self.clues):
+            if clue[0] == row and clue[1] == col:
+                index = i
+                break
+        if index == None:
+            return
+
+        # Retract the layers from this clue up
+        while self.applied > index:
+            self.trail.restore()
+            self.applied -= 1
+
+        value = self.clues.pop( index )[2]
+        if self.solution != None and self.solution.board[row][col] != value:
+            self.conflicts -= 1
+        self.unsolvable = False
+
+        # Re-apply the clues that were added after it
+        self.consistent = True
+        while self.consistent and self.applied < len(self.clues):
+            self.consistent = self.applyClue( self.applied )
+
+    """
+        Applies clue i in a new trail layer and propagates it.
+
+        Return: False if the board became inconsistent. The layer is kept
+                either way, so that removing the clue retracts it.
+    """
+    def applyClue ( self, i ):
+        row, col, value = self.clues[i]
+        v = self.network.variables[row * self.N + col]
+
+        self.trail.placeTrailMarker()
+        self.applied += 1
+        if not v.getDomain().contains( value ):
+            return False
+
+        self.trail.push( v )
+        v.assignValue( value )
+        return self.solver.checkConsistency()
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    """
+        Solves the board with the current clues.
+
+        Return: the solution as a SudokuBoard, or None if there is none or
+                the time limit (in seconds) was reached
+    """
+    def solve ( self, timeLimit = None ):
+        if not self.consistent or self.unsolvable:
+            return None
+
+        if self.solution != None and self.conflicts == 0:
+            self.cacheHits += 1
+            return self.solution
+
+        self.searches += 1
+        solver = self.solver
+        solver.hassolution = False
+        solver.solutionCount = 0
+        solver.solutions = []
+        solver.deadline = time.time() + timeLimit if timeLimit != None else None
+        if self.solution != None:
+            solver.warmStart = self.solution.board
+
+        depth = len( self.trail.trailMarker )
+        self.trail.placeTrailMarker()
+        result = solver.solve()
+        while len( self.trail.trailMarker ) > depth:
+            self.trail.restore()
+
+        if solver.hassolution:
+            self.solution = solver.getSolution()
+            self.conflicts = 0
+            return self.solution
+
+        # Adding clues cannot make an unsolvable board solvable
+        if result == 0:
+            self.unsolvable = True
+        return None
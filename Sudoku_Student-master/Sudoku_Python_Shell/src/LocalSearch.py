@@ -0,0 +1,270 @@
+import math
+import time
+import random
+import SudokuBoard
+
+"""
+    Min-conflicts local search for boards with few givens, where almost any
+    completion is a solution and systematic search wastes its effort.
+
+    The board starts from a random fill in which every block holds each
+    value once, with the givens in place. Only swaps of two free cells of
+    the same block are made, so blocks stay consistent and the cost is the
+    number of repeated values over all rows and columns. Per-row and
+    per-column value counts make the cost change of a swap O(1).
+
+    Each step picks a free cell that is in conflict and looks at swapping it
+    with other free cells of its block:
+        tabu   - the best swap is made unless it puts a value back where it
+                 was moved away from within the last tabuTenure steps, which
+                 is allowed anyway if it gives a new best cost
+        anneal - one random partner is tried and the swap is accepted if it
+                 does not raise the cost, otherwise with probability
+                 exp(-delta / temperature); the temperature cools each step
+    After stallSteps steps without a new best cost the board is filled again
+    from scratch. solve gives up, so that the caller can fall back to a
+    systematic search, once maxStalls fills in a row have not come closer
+    to a solution than an earlier fill, or after maxSteps steps in total.
+"""
+
+class LocalSearch:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, gb, mode = "anneal", seed = None ):
+        self.p = gb.p
+        self.q = gb.q
+        self.N = gb.N
+        self.givens = [ row[:] for row in gb.board ]
+        self.mode = mode
+        self.random = random.Random( seed )
+
+        self.tabuTenure = 10
+        self.temperature = 0.5
+        self.cooling = 0.9999
+        self.stallSteps = 100 * self.N
+        self.maxStalls = 10
+        self.maxSteps = 2000 * self.N * self.N
+
+        # Cells of each block and the block of each cell
+        N = self.N
+        self.blocks = [[] for b in range(N)]
+        self.blockOf = [[ 0 for j in range(N) ] for i in range(N)]
+        for i in range(N):
+            for j in range(N):
+                b = (i // self.p) * self.p + (j // self.q)
+                self.blocks[b].append( ( i, j ) )
+                self.blockOf[i][j] = b
+
+        # Statistics
+        self.steps = 0
+        self.restarts = 0
+
+    # ==================================================================
+    # Board State
+    # ==================================================================
+
+    # Fills every block with its missing values in random order
+    def randomFill ( self ):
+        N = self.N
+        self.grid = [ row[:] for row in self.givens ]
+        for cells in self.blocks:
+            present = set( self.givens[i][j] for i, j in cells )
+            missing = [ v for v in range( 1, N+1 ) if v not in present ]
+            self.random.shuffle( missing )
+            for i, j in cells:
+                if self.givens[i][j] == 0:
+                    self.grid[i][j] = missing.pop()
+
+        self.rowCount = [[ 0 ] * (N+1) for i in range(N)]
+        self.colCount = [[ 0 ] * (N+1) for j in range(N)]
+        for i in range(N):
+            for j in range(N):
+                v = self.grid[i][j]
+                self.rowCount[i][v] += 1
+                self.colCount[j][v] += 1
+
+        self.cost = 0
+        self.badLines = set()
+        for k in range(N):
+            self.cost += self.lineCost( self.rowCount[k] ) + self.lineCost( self.colCount[k] )
+            self.updateLine( k )
+            self.updateLine( N + k )
+        self.tabu = dict()
+
+    # Number of repeated values in a row or column with the given counts
+    def lineCost ( self, counts ):
+        return sum( c - 1 for c in counts if c > 1 )
+
+    # Keeps line k (rows first, then columns) in badLines iff it has repeats
+    def updateLine ( self, k ):
+        counts = self.rowCount[k] if k < self.N else self.colCount[k - self.N]
+        if any( c > 1 for c in counts ):
+            self.badLines.add( k )
+        else:
+            self.badLines.discard( k )
+
+    # Change in cost if the values of two cells of one block were swapped
+    def swapDelta ( self, r1, c1, r2, c2 ):
+        a = self.grid[r1][c1]
+        b = self.grid[r2][c2]
+        delta = 0
+        if r1 != r2:
+            R1 = self.rowCount[r1]
+            R2 = self.rowCount[r2]
+            delta += (R1[b] >= 1) - (R1[a] >= 2) + (R2[a] >= 1) - (R2[b] >= 2)
+        if c1 != c2:
+            C1 = self.colCount[c1]
+            C2 = self.colCount[c2]
+            delta += (C1[b] >= 1) - (C1[a] >= 2) + (C2[a] >= 1) - (C2[b] >= 2)
+        return delta
+
+    def swap ( self, r1, c1, r2, c2, delta ):
+        a = self.grid[r1][c1]
+        b = self.grid[r2][c2]
+        self.grid[r1][c1] = b
+        self.grid[r2][c2] = a
+        self.rowCount[r1][a] -= 1
+        self.rowCount[r1][b] += 1
+        self.rowCount[r2][b] -= 1
+        self.rowCount[r2][a] += 1
+        self.colCount[c1][a] -= 1
+        self.colCount[c1][b] += 1
+        self.colCount[c2][b] -= 1
+        self.colCount[c2][a] += 1
+        self.cost += delta
+        for k in set( [ r1, r2, self.N + c1, self.N + c2 ] ):
+            self.updateLine( k )
+
+        # Moving a value back into a cell it just left is tabu for a while
+        self.tabu[( r1, c1, a )] = self.steps + self.tabuTenure
+        self.tabu[( r2, c2, b )] = self.steps + self.tabuTenure
+
+    # Picks a random free cell holding a repeated value of a random bad line
+    def conflictedCell ( self ):
+        k = self.random.choice( tuple( self.badLines ) )
+        if k < self.N:
+            cells = [ ( k, j ) for j in range(self.N) ]
+            counts = self.rowCount[k]
+        else:
+            cells = [ ( i, k - self.N ) for i in range(self.N) ]
+            counts = self.colCount[k - self.N]
+        cells = [ ( i, j ) for i, j in cells if self.givens[i][j] == 0 and counts[self.grid[i][j]] > 1 ]
+        return self.random.choice( cells ) if cells else None
+
+    # ==================================================================
+    # Search
+    # ==================================================================
+
+    # Makes one move, returning False if no move was possible
+    def step ( self, bestCost ):
+        cell = self.conflictedCell()
+        if cell == None:
+            return False
+        r1, c1 = cell
+        partners = [ ( i, j ) for i, j in self.blocks[self.blockOf[r1][c1]]
+                     if self.givens[i][j] == 0 and ( i, j ) != cell ]
+        if not partners:
+            return False
+
+        if self.mode == "anneal":
+            r2, c2 = self.random.choice( partners )
+            delta = self.swapDelta( r1, c1, r2, c2 )
+            if delta <= 0 or self.random.random() < math.exp( -delta / max( self.temperature, 1e-9 ) ):
+                self.swap( r1, c1, r2, c2, delta )
+            self.temperature *= self.cooling
+            return True
+
+        best = None
+        for r2, c2 in partners:
+            delta = self.swapDelta( r1, c1, r2, c2 )
+            tabu = self.tabu.get( ( r1, c1, self.grid[r2][c2] ), -1 ) >= self.steps \
+                or self.tabu.get( ( r2, c2, self.grid[r1][c1] ), -1 ) >= self.steps
+            if tabu and self.cost + delta >= bestCost:
+                continue
+            if best == None or delta < best[0] or ( delta == best[0] and self.random.random() < 0.5 ):
+                best = ( delta, r2, c2 )
+
+        if best != None:
+            self.swap( r1, c1, best[1], best[2], best[0] )
+        return True
+
+    """
+        Searches for a solution.
+
+        Return: the solution as a SudokuBoard, checked against the rules and
+                the givens, or None if the search stalled, ran out of steps,
+                reached deadline (a time.time() value) or was cancelled
+                through cancelEvent (anything with is_set)
+    """
+    def solve ( self, deadline = None, cancelEvent = None ):
+        if not self.givensConsistent():
+            return None
+
+        self.randomFill()
+        bestCost = self.cost
+        lastImprovement = self.steps
+        temperature = self.temperature
+        overallBest = bestCost
+        stalls = 0
+
+        while self.steps < self.maxSteps:
+            if self.cost == 0:
+                solution = SudokuBoard.SudokuBoard( self.p, self.q, board=[ row[:] for row in self.grid ] )
+                return solution if self.isSolution( solution.board ) else None
+
+            if self.steps % 1000 == 0:
+                if deadline != None and time.time() > deadline:
+                    return None
+                if cancelEvent != None and cancelEvent.is_set():
+                    return None
+
+            self.steps += 1
+            if not self.step( bestCost ) or self.steps - lastImprovement > self.stallSteps:
+                if bestCost < overallBest:
+                    overallBest = bestCost
+                    stalls = 0
+                else:
+                    stalls += 1
+                    if stalls >= self.maxStalls:
+                        return None
+                self.restarts += 1
+                self.temperature = temperature
+                self.randomFill()
+                bestCost = self.cost
+                lastImprovement = self.steps
+            elif self.cost < bestCost:
+                bestCost = self.cost
+                lastImprovement = self.steps
+
+        return None
+
+    # ==================================================================
+    # Checks
+    # ==================================================================
+
+    # Returns False if two givens of one unit share a value
+    def givensConsistent ( self ):
+        N = self.N
+        units = [ [ ( i, j ) for j in range(N) ] for i in range(N) ] \
+              + [ [ ( i, j ) for i in range(N) ] for j in range(N) ] + self.blocks
+        for unit in units:
+            values = [ self.givens[i][j] for i, j in unit if self.givens[i][j] != 0 ]
+            if len( values ) != len( set( values ) ):
+                return False
+        return True
+
+    # Returns True if the grid solves the board
+    def isSolution ( self, grid ):
+        N = self.N
+        full = set( range( 1, N+1 ) )
+        for i in range(N):
+            for j in range(N):
+                if self.givens[i][j] != 0 and grid[i][j] != self.givens[i][j]:
+                    return False
+        for k in range(N):
+            if set( grid[k] ) != full or set( grid[i][k] for i in range(N) ) != full:
+                return False
+        return all( set( grid[i][j] for i, j in cells ) == full for cells in self.blocks )
@@ -3,11 +3,16 @@
 import sys
 import os
 import math
+import json
 import SudokuBoard
 import Constraint
 import ConstraintNetwork
 import BTSolver
 import Trail
+import MemoryStats
+import MetricsExporter
+import LocalSearch
+import AutoTuner
 import time
 
 """
@@ -15,22 +20,37 @@ import time
     command line and properly starting the backtrack solver.
 """
 
-def main ( ):
-    args = sys.argv
+# Consistency checks that should also be run once before searching
+PROPAGATING_CHECKS = ["forwardChecking","norvigCheck","tournCC","adaptive","gacCheck","bitCheck"]
 
-    # Important Variables
-    file   = "";
-    var_sh = "";
-    val_sh = "";
-    cc     = "";
+# Options that are copied onto the solver as attributes of the same name
+SOLVER_SETTINGS = ["subsetOrder", "intersections", "restartSchedule", "restartBase", "discrepancyMode",
+                   "cancelEvent", "progressCallback", "progressInterval", "probeDepth"]
+
+"""
+    Translates the command line flags into heuristic names.
 
-    for arg in [args[i] for i in range(1, len(args))]:
+    Return: a tuple (file, var_sh, val_sh, cc, options). options holds the
+            settings of the optional solver modes. Any argument that is not
+            a known flag is taken to be the file.
+"""
+def parseArgs ( args ):
+    file    = "";
+    var_sh  = "";
+    val_sh  = "";
+    cc      = "";
+    options = dict();
+
+    for arg in args:
         if arg == "MRV":
             var_sh = "MinimumRemainingValue"
 
         elif arg == "MAD":
             var_sh = "MRVwithTieBreaker"
 
+        elif arg == "WDEG":
+            var_sh = "domWdeg"
+
         elif arg == "LCV":
             val_sh = "LeastConstrainingValue"
 
@@ -40,25 +60,230 @@ def main ( ):
         elif arg == "NOR":
             cc = "norvigCheck"
 
+        elif arg == "ADAPT":
+            cc = "adaptive"
+
+        elif arg == "GAC":
+            cc = "gacCheck"
+
+        elif arg == "BITS":
+            cc = "bitCheck"
+
+        elif arg == "SAC":
+            options["probeDepth"] = 0
+
+        elif arg.startswith("SAC="):
+            options["probeDepth"] = int(arg[len("SAC="):])
+
+        elif arg == "LDS":
+            options["discrepancyMode"] = "lds"
+
+        elif arg == "DDS":
+            options["discrepancyMode"] = "dds"
+
         elif arg == "TOURN":
             var_sh = "tournVar"
             val_sh = "tournVal"
             cc     = "tournCC"
 
+        elif arg == "UNIQUE":
+            options["solutionLimit"] = 2
+
+        elif arg.startswith("COUNT="):
+            options["solutionLimit"] = int(arg[len("COUNT="):])
+
+        elif arg.startswith("SUBSET="):
+            options["subsetOrder"] = int(arg[len("SUBSET="):])
+
+        elif arg == "INT":
+            options["intersections"] = True
+
+        elif arg == "LUBY":
+            options["restartSchedule"] = "luby"
+
+        elif arg == "GEOM":
+            options["restartSchedule"] = "geometric"
+
+        elif arg.startswith("RESTART="):
+            options["restartBase"] = int(arg[len("RESTART="):])
+
+        elif arg.startswith("SEED="):
+            options["seed"] = int(arg[len("SEED="):])
+
+        elif arg.startswith("CHECKPOINT="):
+            options["checkpoint"] = arg[len("CHECKPOINT="):]
+
+        elif arg.startswith("CHECKPOINT_EVERY="):
+            options["checkpointInterval"] = float(arg[len("CHECKPOINT_EVERY="):])
+
+        elif arg.startswith("RESUME="):
+            options["resume"] = arg[len("RESUME="):]
+
+        elif arg == "MINCONF":
+            options["localSearch"] = "anneal"
+
+        elif arg.startswith("MINCONF="):
+            options["localSearch"] = arg[len("MINCONF="):]
+
+        elif arg == "AUTO":
+            options["auto"] = AutoTuner.DEFAULT_MODEL
+
+        elif arg.startswith("AUTO="):
+            options["auto"] = arg[len("AUTO="):]
+
+        elif arg == "MEM":
+            options.setdefault( "memory", "rss" )
+
+        elif arg == "MEMTRACE":
+            options["memory"] = "trace"
+
+        elif arg.startswith("METRICS="):
+            options["metrics"] = arg[len("METRICS="):]
+
+        elif arg.startswith("METRICS_EVERY="):
+            options["metricsInterval"] = float(arg[len("METRICS_EVERY="):])
+
         else:
             file = arg;
 
+    # Stacked propagators need domains to be pruned in the first place
+    if cc == "" and ( options.get("subsetOrder", 0) >= 2 or options.get("intersections", False) or "probeDepth" in options ):
+        cc = "forwardChecking"
+
+    return ( file, var_sh, val_sh, cc, options )
+
+# Builds a solver for the board, propagates the givens and searches
+def solveBoard ( sudokudata, trail, val_sh, var_sh, cc, options = None, deadline = None ):
+    if options == None:
+        options = dict()
+
+    # Let the tuned model pick the heuristics; other options still apply
+    if "auto" in options:
+        file, var_sh, val_sh, cc, autoOptions = parseArgs( AutoTuner.selectFlags( options["auto"], sudokudata ) )
+        autoOptions.update( ( k, v ) for k, v in options.items() if k != "auto" )
+        return solveBoard( sudokudata, trail, val_sh, var_sh, cc, autoOptions, deadline )
+
+    solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
+    solver.deadline = deadline
+    for name in SOLVER_SETTINGS:
+        if name in options:
+            setattr( solver, name, options[name] )
+
+    # Local search first, the backtracking search is the fallback
+    if "localSearch" in options and "solutionLimit" not in options:
+        solution = LocalSearch.LocalSearch( sudokudata, options["localSearch"], options.get( "seed" ) ).solve( deadline, solver.cancelEvent )
+        if solution != None:
+            solver.hassolution = True
+            solver.solutionCount = 1
+            solver.solutions = [ solution ]
+            return solver
+        if solver.cancelEvent != None and solver.cancelEvent.is_set():
+            solver.cancelled = True
+            return solver
+
+    if cc in PROPAGATING_CHECKS or solver.subsetOrder >= 2 or solver.intersections or solver.probeDepth != None:
+        solver.checkConsistency()
+
+    if "seed" in options:
+        solver.random.seed( options["seed"] )
+
+    if "checkpoint" in options:
+        solver.checkpointPath = options["checkpoint"]
+        solver.checkpointFlags = options.get( "flags", [] )
+    if "checkpointInterval" in options:
+        solver.checkpointInterval = options["checkpointInterval"]
+    if "resume" in options:
+        solver.loadCheckpoint( readCheckpoint( options["resume"] ) )
+
+    # With a deadline the caller's limit replaces the search's own budget
+    timeLeft = 600 if deadline == None else float( "inf" )
+
+    if "solutionLimit" in options:
+        solver.countSolutions( options["solutionLimit"], time_left=timeLeft )
+    elif "restartSchedule" in options or "restartBase" in options:
+        solver.solveWithRestarts( time_left=timeLeft )
+    elif "discrepancyMode" in options:
+        solver.solveLDS( time_left=timeLeft )
+    else:
+        solver.solve( time_left=timeLeft )
+    return solver
+
+# Reads a checkpoint file written by BTSolver.writeCheckpoint
+def readCheckpoint ( path ):
+    with open( path ) as f:
+        return json.load( f )
+
+"""
+    Resolves RESUME=path: the flags saved in the checkpoint come first, so
+    flags given again on the command line override them, and the search
+    keeps checkpointing to the same file unless CHECKPOINT says otherwise.
+
+    Return: the full argument list and the checkpoint, or None without RESUME
+"""
+def resumeArgs ( args ):
+    for arg in args:
+        if arg.startswith("RESUME="):
+            checkpoint = readCheckpoint( arg[len("RESUME="):] )
+            args = checkpoint["flags"] + args
+            if not any( a.startswith("CHECKPOINT=") for a in args ):
+                args = args + [ "CHECKPOINT=" + arg[len("RESUME="):] ]
+            return ( args, checkpoint )
+    return ( args, None )
+
+# Prints the statistics of the optional solver modes that were used
+def printSolverStats ( solver ):
+    if solver.randomize:
+        print( "Restarts: " + str(solver.restarts) )
+
+    if solver.discrepancyIterations:
+        print( "Discrepancy Iterations: " + str(solver.discrepancyIterations) )
+
+    if solver.cChecks == "adaptive":
+        for line in solver.adaptiveReport():
+            print( line )
+
+    if solver.cChecks == "gacCheck":
+        for line in solver.gacReport():
+            print( line )
+
+    if solver.probeDepth != None:
+        for line in solver.probeReport():
+            print( line )
+
+    if solver.solutionLimit <= 1:
+        return
+
+    output = "Solutions Counted: " + str(solver.solutionCount)
+    if solver.solutionCount >= solver.solutionLimit:
+        output += " (limit reached)"
+    print( output )
+    if solver.solutionLimit == 2:
+        print( "Unique: " + str(solver.solutionCount == 1) )
+
+def main ( ):
+    args = sys.argv
+
+    # Important Variables
+    flags, checkpoint = resumeArgs( args[1:] )
+    file, var_sh, val_sh, cc, options = parseArgs( flags )
+    options["flags"] = [ a for a in flags if a != file and not a.startswith("RESUME=") ]
+
+    if "auto" in options and not os.path.isfile( options["auto"] ):
+        print ( "[ERROR] no model, run AutoTuner.py first" )
+        return
+
     trail = Trail.Trail();
 
     if file == "":
-        sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7 )
+        if checkpoint != None:
+            sudokudata = SudokuBoard.SudokuBoard( text=checkpoint["board"] )
+        else:
+            sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7 )
         print(sudokudata)
 
-        solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-        if cc in ["forwardChecking","norvigCheck","tournCC"]:
-            solver.checkConsistency()
-        solver.solve()
+        solver = solveBoard( sudokudata, trail, val_sh, var_sh, cc, options )
 
+        printSolverStats( solver )
         if solver.hassolution:
             print( solver.getSolution() )
             print( "Trail Pushes: " + str(trail.getPushCount()) )
@@ -79,25 +304,48 @@ def main ( ):
             return
 
         numSolutions = 0
+
+        # Per-board memory accounting, see MemoryStats
+        memory = None
+        if "memory" in options:
+            memory = MemoryStats.MemoryStats( trace=options["memory"] == "trace" )
+
+        # Live progress, see MetricsExporter
+        metrics = None
+        if "metrics" in options:
+            metrics = MetricsExporter.MetricsExporter( options["metrics"], options.get( "metricsInterval", MetricsExporter.DEFAULT_INTERVAL ), len(listOfBoards) )
+            metrics.start()
         
         last_num_undo = 0
         for f in listOfBoards:
             print ( "Running board: " + str(f) )
+            # What a board left on the trail belongs to its own network
+            trail.clear()
+            if memory != None:
+                memory.start( trail )
+            if metrics != None:
+                metrics.boardStarted( f )
             sudokudata = SudokuBoard.SudokuBoard( filepath=os.path.join( file, f ) )
 
-            solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-            if cc in ["forwardChecking","norvigCheck","tournCC"]:
-                solver.checkConsistency()
-            solver.solve()
+            solver = solveBoard( sudokudata, trail, val_sh, var_sh, cc, options )
 
             if solver.hassolution:
                 numSolutions += 1
+            if metrics != None:
+                metrics.boardFinished( f, solver.hassolution )
             
             num_undo = trail.getUndoCount() - last_num_undo
             last_num_undo = trail.getUndoCount()
             print ( "Backtracks: "  + str(num_undo) )
+            if memory != None:
+                for line in memory.format( memory.stop( trail ) ):
+                    print ( line )
+            printSolverStats( solver )
             print ( "Solutions Found: " + str(numSolutions) )
 
+        if metrics != None:
+            metrics.stop()
+
         print ( "Solutions Found: " + str(numSolutions) )
         print ( "Trail Pushes: " + str(trail.getPushCount()) )
         print ( "Backtracks: "  + str(trail.getUndoCount()) )
@@ -107,11 +355,9 @@ def main ( ):
     sudokudata =  SudokuBoard.SudokuBoard( filepath=os.path.abspath( file ) )
     print(sudokudata)
 
-    solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-    if cc in ["forwardChecking","norvigCheck","tournCC"]:
-        solver.checkConsistency()
-    solver.solve()
+    solver = solveBoard( sudokudata, trail, val_sh, var_sh, cc, options )
 
+    printSolverStats( solver )
     if solver.hassolution:
         print( solver.getSolution() )
         print( "Trail Pushes: " + str(trail.getPushCount()) )
@@ -120,4 +366,5 @@ def main ( ):
     else:
         print( "Failed to find a solution" )
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import tracemalloc
+
+"""
+    Per-board memory accounting for batch runs.
+
+    The basic mode only reads the peak resident set size of the process,
+    which the kernel already tracks, so it costs nothing during the search.
+    Where /proc/self/clear_refs is available the peak is reset before each
+    board, otherwise it is the peak of the whole process so far.
+
+    With tracing on, tracemalloc also records every allocation, and the
+    memory held when the trail is at its longest is attributed to the trail,
+    the constraint network or the heuristics by the files that allocated
+    it. A snapshot is taken each time the trail grows by SNAPSHOT_GROWTH
+    over the last one, so the one kept is within that factor of the peak.
+    Tracing slows the search down noticeably and is meant for diagnosis
+    rather than production sampling.
+"""
+
+# Source files whose allocations are attributed to each part of the solver.
+# Allocations made under Trail.py (such as the domain copies of push) count
+# as trail memory whichever file does the allocating.
+TRAIL_FILES     = [ "Trail.py" ]
+NETWORK_FILES   = [ "ConstraintNetwork.py", "Constraint.py", "Variable.py", "Domain.py", "Topology.py", "SudokuBoard.py" ]
+HEURISTIC_FILES = [ "BTSolver.py" ]
+
+MB = 1024 * 1024
+
+# Growth of the trail, as a factor, between two attribution snapshots
+SNAPSHOT_GROWTH = 1.25
+
+class MemoryStats:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, trace = False ):
+        self.trace = trace
+        self.peakRSSIsPerBoard = False
+        self.trailBase = 0
+        self.snapshot = None
+        self.nextSnapshot = 0
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start( 2 )
+
+    # ==================================================================
+    # Measuring
+    # ==================================================================
+
+    # Starts measuring one board
+    def start ( self, trail ):
+        trail.resetMaxSize()
+        self.trailBase = trail.size()
+        self.peakRSSIsPerBoard = resetPeakRSS()
+        if self.trace:
+            # clear_traces also resets the peak; reset_peak needs Python 3.9
+            tracemalloc.clear_traces()
+            self.snapshot = None
+            self.nextSnapshot = 0
+            trail.observer = self
+
+    # Snapshots the traced memory when the trail has grown enough since the last one
+    def trailGrew ( self, trail ):
+        if trail.getMaxSize() >= self.nextSnapshot:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.nextSnapshot = int( trail.getMaxSize() * SNAPSHOT_GROWTH ) + 1
+
+    """
+        Finishes measuring one board.
+
+        Return: a dict with "peakRSS" in bytes, "maxTrail" (the growth of
+                the trail over its size at start) and, when tracing,
+                "tracedPeak" and the bytes held by "trail", "network",
+                "heuristics" and "other" at the trail's peak
+    """
+    def stop ( self, trail ):
+        stats = { "peakRSS" : peakRSS(), "maxTrail" : trail.getMaxSize() - self.trailBase }
+        if self.trace:
+            trail.observer = None
+            stats["tracedPeak"] = tracemalloc.get_traced_memory()[1]
+            snapshot = self.snapshot if self.snapshot != None else tracemalloc.take_snapshot()
+            stats.update( attribute( snapshot ) )
+            self.snapshot = None
+        return stats
+
+    # Returns the statistics of stop as report lines
+    def format ( self, stats ):
+        lines = []
+        peak = "Peak RSS: {:.1f} MB".format( stats["peakRSS"] / MB )
+        if not self.peakRSSIsPerBoard:
+            peak += " (process)"
+        lines.append( peak )
+        lines.append( "Max Trail Length: " + str(stats["maxTrail"]) )
+        if self.trace:
+            lines.append( "Traced Peak: {:.1f} MB (at trail peak: trail {:.1f} MB, network {:.1f} MB, heuristics {:.1f} MB, other {:.1f} MB)".format(
+                stats["tracedPeak"] / MB, stats["trail"] / MB, stats["network"] / MB, stats["heuristics"] / MB, stats["other"] / MB ) )
+        return lines
+
+# ==================================================================
+# Helpers
+# ==================================================================
+
+# Resets the kernel's peak RSS of this process, returning False if unsupported
+def resetPeakRSS ( ):
+    try:
+        with open( "/proc/self/clear_refs", "w" ) as f:
+            f.write( "5" )
+        return True
+    except OSError:
+        return False
+
+# Returns the peak resident set size of this process in bytes
+def peakRSS ( ):
+    try:
+        with open( "/proc/self/status" ) as f:
+            for line in f:
+                if line.startswith( "VmHWM:" ):
+                    return int( line.split()[1] ) * 1024
+    except OSError:
+        pass
+
+    import resource
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+# Sums the memory of a tracemalloc snapshot per part of the solver
+def attribute ( snapshot ):
+    totals = { "trail" : 0, "network" : 0, "heuristics" : 0, "other" : 0 }
+    for stat in snapshot.statistics( "traceback" ):
+        files = [ os.path.basename( frame.filename ) for frame in reversed( stat.traceback ) ]
+        if any( f in TRAIL_FILES for f in files ):
+            part = "trail"
+        elif files[0] in NETWORK_FILES:
+            part = "network"
+        elif files[0] in HEURISTIC_FILES:
+            part = "heuristics"
+        else:
+            part = "other"
+        totals[part] += stat.size
+    return totals
@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+import http.server
+import socketserver
+import Trail
+
+"""
+    Live metrics for long batch runs in the Prometheus text format, either
+    rewritten to a file every interval seconds (for the node exporter's
+    textfile collector, or just for watching with cat) or served on
+    /metrics by a local HTTP endpoint.
+
+    The solving thread only calls boardStarted and boardFinished once per
+    board; everything else, including the backtrack rate, is sampled from a
+    background thread that reads the Trail counters, so nothing is added to
+    the search itself. Rates are over the last interval. The run time of
+    every board still in flight is exported so stuck boards stand out.
+
+    Targets: a file path, or "http:PORT" / "http:HOST:PORT".
+"""
+
+DEFAULT_INTERVAL = 10
+
+class MetricsExporter:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, target, interval = DEFAULT_INTERVAL, boardsTotal = None ):
+        self.target = target
+        self.interval = interval
+        self.boardsTotal = boardsTotal
+        self.lock = threading.Lock()
+
+        self.startTime = time.time()
+        self.boardsDone = 0
+        self.solutionsFound = 0
+        self.inFlight = dict()
+
+        # Backtracks of boards solved in other processes, see boardFinished
+        self.remoteBacktracks = 0
+
+        # Previous sample, for the rates
+        self.lastSample = ( self.startTime, 0, 0 )
+        self.boardsPerSecond = 0.0
+        self.backtracksPerSecond = 0.0
+        self.text = ""
+
+        self.stopped = threading.Event()
+        self.server = None
+        self.sampler = None
+
+    # ==================================================================
+    # Updates
+    # ==================================================================
+
+    def boardStarted ( self, board ):
+        with self.lock:
+            self.inFlight[board] = time.time()
+
+    # backtracks only needs to be given for boards solved in another process
+    def boardFinished ( self, board, solved, backtracks = 0 ):
+        with self.lock:
+            self.inFlight.pop( board, None )
+            self.boardsDone += 1
+            if solved:
+                self.solutionsFound += 1
+            self.remoteBacktracks += backtracks
+
+    def backtracks ( self ):
+        return Trail.Trail.numUndo + self.remoteBacktracks
+
+    # ==================================================================
+    # Export
+    # ==================================================================
+
+    # Updates the rates and the exported text
+    def sample ( self ):
+        now = time.time()
+        with self.lock:
+            boardsDone = self.boardsDone
+            solutionsFound = self.solutionsFound
+            inFlight = list( self.inFlight.items() )
+        backtracks = self.backtracks()
+
+        lastTime, lastBoards, lastBacktracks = self.lastSample
+        if now > lastTime:
+            self.boardsPerSecond = ( boardsDone - lastBoards ) / ( now - lastTime )
+            self.backtracksPerSecond = ( backtracks - lastBacktracks ) / ( now - lastTime )
+        self.lastSample = ( now, boardsDone, backtracks )
+
+        lines = []
+        def metric ( name, kind, help, samples ):
+            lines.append( "# HELP " + name + " " + help )
+            lines.append( "# TYPE " + name + " " + kind )
+            for labels, value in samples:
+                lines.append( name + labels + " " + repr( float(value) ) )
+
+        if self.boardsTotal != None:
+            metric( "sudoku_boards", "gauge", "Boards in the run.", [ ( "", self.boardsTotal ) ] )
+        metric( "sudoku_boards_done_total", "counter", "Boards finished.", [ ( "", boardsDone ) ] )
+        metric( "sudoku_solutions_found_total", "counter", "Boards solved.", [ ( "", solutionsFound ) ] )
+        metric( "sudoku_boards_per_second", "gauge", "Boards finished per second over the last interval.", [ ( "", self.boardsPerSecond ) ] )
+        metric( "sudoku_backtracks_total", "counter", "Backtracks so far.", [ ( "", backtracks ) ] )
+        metric( "sudoku_backtracks_per_second", "gauge", "Backtracks per second over the last interval.", [ ( "", self.backtracksPerSecond ) ] )
+        metric( "sudoku_board_running_seconds", "gauge", "Run time of the boards in flight.",
+                [ ( '{board="' + escapeLabel( board ) + '"}', now - started ) for board, started in sorted( inFlight ) ] )
+        metric( "sudoku_run_seconds", "gauge", "Time since the run started.", [ ( "", now - self.startTime ) ] )
+
+        self.text = "\n".join( lines ) + "\n"
+        if self.server == None:
+            writeAtomically( self.target, self.text )
+
+    def run ( self ):
+        while not self.stopped.wait( self.interval ):
+            self.sample()
+
+    def start ( self ):
+        if self.target.startswith( "http:" ):
+            address = self.target[len("http:"):]
+            host, port = address.rsplit( ":", 1 ) if ":" in address else ( "localhost", address )
+            self.server = MetricsServer( ( host, int(port) ), MetricsRequestHandler )
+            self.server.exporter = self
+            threading.Thread( target=self.server.serve_forever, daemon=True ).start()
+
+        self.sample()
+        self.sampler = threading.Thread( target=self.run, daemon=True )
+        self.sampler.start()
+
+    # Takes a last sample so the file holds the final numbers
+    def stop ( self ):
+        self.stopped.set()
+        if self.sampler != None:
+            self.sampler.join()
+        self.sample()
+        if self.server != None:
+            self.server.shutdown()
+            self.server.server_close()
+
+class MetricsServer ( socketserver.ThreadingMixIn, http.server.HTTPServer ):
+    daemon_threads = True
+
+class MetricsRequestHandler ( http.server.BaseHTTPRequestHandler ):
+
+    def do_GET ( self ):
+        if self.path != "/metrics":
+            self.send_error( 404 )
+            return
+        body = self.server.exporter.text.encode()
+        self.send_response( 200 )
+        self.send_header( "Content-Type", "text/plain; version=0.0.4" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    # Scrapes are not worth a log line each
+    def log_message ( self, format, *args ):
+        pass
+
+# ==================================================================
+# Helpers
+# ==================================================================
+
+def escapeLabel ( value ):
+    return value.replace( "\\", "\\\\" ).replace( "\"", "\\\"" ).replace( "\n", "\\n" )
+
+# Replaces the file in one step so readers never see half of it
+def writeAtomically ( path, text ):
+    tmp = path + ".tmp"
+    with open( tmp, "w" ) as f:
+        f.write( text )
+    os.replace( tmp, path )
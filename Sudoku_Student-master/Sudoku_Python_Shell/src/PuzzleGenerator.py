@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import random
+import multiprocessing
+import SudokuBoard
+import BTSolver
+import Trail
+
+"""
+    Bulk puzzle generator. Every board starts from a random solved grid, so
+    it is always solvable, and clues are then removed down to the target.
+    A clue is only removed if the solver still finds exactly one solution
+    without it; NOUNIQUE skips that check and only keeps solvability.
+
+    Usage: python3 PuzzleGenerator.py Base_File_Name #ofBoards p q m [SEED=s] [WORKERS=w] [NOUNIQUE] [DIFFICULTY=d]
+
+    m is the target number of givens. DIFFICULTY overrides m with a fraction
+    of the cells (see DIFFICULTY_GIVENS). The board may keep more than m
+    givens when no further clue can be removed without losing uniqueness,
+    which is how the expert level ends up with as few as possible. Board i is
+    generated from seed s + i, so a run is reproducible regardless of the
+    number of workers.
+"""
+
+# Fraction of the cells left as givens for each difficulty
+DIFFICULTY_GIVENS = {
+    "easy"         : 0.50,
+    "intermediate" : 0.40,
+    "hard"         : 0.33,
+    "expert"       : 0.0,     # as few as uniqueness allows
+}
+
+# ==================================================================
+# Generation
+# ==================================================================
+
+# Returns True if the board has exactly one solution
+def hasUniqueSolution ( sudokudata ):
+    solver = BTSolver.BTSolver( sudokudata, Trail.Trail(), "", "MinimumRemainingValue", "norvigCheck" )
+    if not solver.checkConsistency():
+        return False
+    return solver.countSolutions( 2 ) == 1
+
+"""
+    Generates one board.
+
+    Return: a SudokuBoard with at least m givens (exactly m unless unique
+            is set and no more clues could be removed).
+"""
+def generateBoard ( p, q, m, seed, unique = True ):
+    rng = random.Random( seed )
+    sudokudata = SudokuBoard.SudokuBoard( p, q, 0 )
+    N = sudokudata.N
+    sudokudata.board = sudokudata.solvedGrid( rng )
+
+    cells = list(range(N*N))
+    rng.shuffle(cells)
+    givens = N*N
+
+    for c in cells:
+        if givens <= m:
+            break
+
+        row = c // N
+        col = c % N
+        value = sudokudata.board[row][col]
+        sudokudata.board[row][col] = 0
+
+        if unique and not hasUniqueSolution( sudokudata ):
+            sudokudata.board[row][col] = value
+        else:
+            givens -= 1
+
+    return sudokudata
+
+# Generates one board and writes it to its file
+def writeBoard ( job ):
+    p, q, m, seed, unique, filename = job
+    sudokudata = generateBoard( p, q, m, seed, unique )
+    with open( filename, "w" ) as f:
+        f.write( sudokudata.toText() )
+    return filename
+
+def main ( ):
+    args = sys.argv[1:]
+    positional = [ a for a in args if "=" not in a and a != "NOUNIQUE" ]
+
+    if len(positional) != 5:
+        print ( "Usage: PuzzleGenerator Base_File_Name #ofBoards p q m [SEED=s] [WORKERS=w] [NOUNIQUE] [DIFFICULTY=d]" )
+        return
+
+    baseFileName = positional[0]
+    numOfFiles = int(positional[1])
+    p = int(positional[2])
+    q = int(positional[3])
+    m = int(positional[4])
+    seed = random.randrange( 2**31 )
+    workers = os.cpu_count()
+    unique = True
+
+    for arg in args:
+        if arg.startswith("SEED="):
+            seed = int(arg[len("SEED="):])
+
+        elif arg.startswith("WORKERS="):
+            workers = int(arg[len("WORKERS="):])
+
+        elif arg.startswith("DIFFICULTY="):
+            m = int( DIFFICULTY_GIVENS[arg[len("DIFFICULTY="):].lower()] * (p*q)**2 )
+
+        elif arg == "NOUNIQUE":
+            unique = False
+
+    print ( "Seed: " + str(seed) )
+    jobs = [ ( p, q, m, seed + i, unique, baseFileName + "_" + str(i) + ".txt" ) for i in range(numOfFiles) ]
+
+    if workers <= 1:
+        for job in jobs:
+            print ( "Created " + writeBoard( job ) )
+        return
+
+    with multiprocessing.Pool( workers ) as pool:
+        for filename in pool.imap_unordered( writeBoard, jobs ):
+            print ( "Created " + filename )
+
+if __name__ == "__main__":
+    main()
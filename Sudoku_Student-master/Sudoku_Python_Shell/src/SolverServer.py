@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import threading
+import concurrent.futures
+import http.server
+import socketserver
+import urllib.parse
+from collections import OrderedDict
+import SudokuBoard
+import Trail
+import Main
+
+"""
+    Long-lived solver service. Keeps a pool of worker processes alive so that
+    interpreter startup, imports and topology templates are paid once, and
+    caches results of boards it has already solved.
+
+    Usage: python3 SolverServer.py [HOST:PORT | unix:PATH] [WORKERS] [CACHE_SIZE]
+
+    Boards are POSTed to /solve in the input file format. Heuristics are
+    given with the same flags as Main.py and a time limit in seconds, e.g.
+
+        curl --data-binary @board.txt 'localhost:8171/solve?flags=MAD,LCV,NOR&timeout=10'
+        curl --unix-socket /tmp/sudoku.sock --data-binary @board.txt localhost/solve
+
+    The reply is a JSON object with "status" (solved, unsolvable, timeout or
+    error), "solution" in the input file format, "pushes", "backtracks",
+    "time" and "cached". With COUNT or UNIQUE, "complete" tells whether the
+    count ran to the end or stopped at the time limit.
+"""
+
+DEFAULT_ADDRESS    = "localhost:8171"
+DEFAULT_TIME_LIMIT = 600
+
+# ==================================================================
+# Worker Process
+# ==================================================================
+
+# Solves one board inside a pool worker, settings are extra solveBoard options
+def solveText ( text, flags, timeLimit, settings = None ):
+    start = time.time()
+    try:
+        file, var_sh, val_sh, cc, options = Main.parseArgs( flags )
+        if settings != None:
+            options.update( settings )
+        sudokudata = SudokuBoard.SudokuBoard( text=text )
+        trail = Trail.Trail()
+        pushes = trail.getPushCount()
+        undos = trail.getUndoCount()
+
+        solver = Main.solveBoard( sudokudata, trail, val_sh, var_sh, cc, options, deadline=start + timeLimit )
+
+        # Only a search that ran to completion proves there is no solution
+        result = dict()
+        if solver.hassolution:
+            result["status"] = "solved"
+            result["solution"] = solver.getSolution().toText()
+            if solver.solutionLimit > 1:
+                result["solutionCount"] = solver.solutionCount
+                result["solutions"] = [ b.toText() for b in solver.solutions ]
+                result["complete"] = not ( solver.timedOut or solver.cancelled )
+        elif solver.cancelled:
+            result["status"] = "cancelled"
+        elif solver.timedOut:
+            result["status"] = "timeout"
+        else:
+            result["status"] = "unsolvable"
+        result["pushes"] = trail.getPushCount() - pushes
+        result["backtracks"] = trail.getUndoCount() - undos
+
+    except Exception as e:
+        result = { "status" : "error", "error" : str(e) }
+
+    result["time"] = time.time() - start
+    return result
+
+# ==================================================================
+# Server
+# ==================================================================
+
+class SolverService:
+
+    def __init__ ( self, workers = None, cacheSize = 10000 ):
+        self.pool = concurrent.futures.ProcessPoolExecutor( max_workers=workers )
+        self.cache = OrderedDict()
+        self.cacheSize = cacheSize
+        self.lock = threading.Lock()
+
+        # Submitted searches, cancelled by hand on shutdown
+        self.pending = set()
+
+    # Returns the result for a board, from the cache if it was seen before
+    def solve ( self, text, flags, timeLimit ):
+        sudokudata = SudokuBoard.SudokuBoard( text=text )
+        key = ( sudokudata.toText(), tuple( sorted( flags ) ) )
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end( key )
+                result = dict( self.cache[key] )
+                result["cached"] = True
+                return result
+
+        future = self.pool.submit( solveText, key[0], flags, timeLimit )
+        with self.lock:
+            self.pending.add( future )
+        future.add_done_callback( self.finished )
+        try:
+            result = future.result( timeout=timeLimit + 5 )
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return { "status" : "timeout", "cached" : False }
+
+        # Timeouts depend on the limit, so only definite answers are kept
+        if result["status"] in ["solved", "unsolvable"] and result.get( "complete", True ):
+            with self.lock:
+                self.cache[key] = result
+                if len(self.cache) > self.cacheSize:
+                    self.cache.popitem( last=False )
+
+        result = dict( result )
+        result["cached"] = False
+        return result
+
+    def finished ( self, future ):
+        with self.lock:
+            self.pending.discard( future )
+
+    # Searches that have not started are dropped, running ones are not waited for
+    def shutdown ( self ):
+        with self.lock:
+            pending = list( self.pending )
+        for future in pending:
+            future.cancel()
+        self.pool.shutdown( wait=False )
+
+class SolverRequestHandler ( http.server.BaseHTTPRequestHandler ):
+
+    def do_POST ( self ):
+        url = urllib.parse.urlparse( self.path )
+        if url.path != "/solve":
+            self.reply( 404, { "status" : "error", "error" : "unknown path " + url.path } )
+            return
+
+        query = urllib.parse.parse_qs( url.query )
+        flags = []
+        for f in query.get( "flags", [] ):
+            flags.extend( [ x for x in f.split( "," ) if x != "" ] )
+
+        try:
+            timeLimit = float( query.get( "timeout", [DEFAULT_TIME_LIMIT] )[0] )
+            length = int( self.headers.get( "Content-Length", 0 ) )
+            text = self.rfile.read( length ).decode()
+            result = self.server.service.solve( text, flags, timeLimit )
+        except Exception as e:
+            self.reply( 400, { "status" : "error", "error" : str(e) } )
+            return
+
+        self.reply( 200, result )
+
+    def do_GET ( self ):
+        if self.path == "/health":
+            self.reply( 200, { "status" : "ok" } )
+        else:
+            self.reply( 404, { "status" : "error", "error" : "unknown path " + self.path } )
+
+    def reply ( self, code, result ):
+        body = json.dumps( result ).encode()
+        self.send_response( code )
+        self.send_header( "Content-Type", "application/json" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def address_string ( self ):
+        # Unix socket clients have no host/port pair
+        if isinstance( self.client_address, tuple ):
+            return self.client_address[0]
+        return "unix"
+
+class TCPSolverServer ( socketserver.ThreadingMixIn, http.server.HTTPServer ):
+    daemon_threads = True
+
+class UnixSolverServer ( socketserver.ThreadingMixIn, socketserver.UnixStreamServer ):
+    daemon_threads = True
+
+    def server_bind ( self ):
+        if os.path.exists( self.server_address ):
+            os.remove( self.server_address )
+        socketserver.UnixStreamServer.server_bind( self )
+
+# Creates the listening server for "HOST:PORT" or "unix:PATH"
+def makeServer ( address, service ):
+    if address.startswith( "unix:" ):
+        server = UnixSolverServer( address[len("unix:"):], SolverRequestHandler )
+    else:
+        host, port = address.rsplit( ":", 1 )
+        server = TCPSolverServer( ( host, int(port) ), SolverRequestHandler )
+    server.service = service
+    return server
+
+def main ( ):
+    args = sys.argv[1:]
+    address   = args[0] if len(args) > 0 else DEFAULT_ADDRESS
+    workers   = int(args[1]) if len(args) > 1 else None
+    cacheSize = int(args[2]) if len(args) > 2 else 10000
+
+    service = SolverService( workers, cacheSize )
+    server = makeServer( address, service )
+    print( "Listening on " + address )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if address.startswith( "unix:" ) and os.path.exists( address[len("unix:"):] ):
+            os.remove( address[len("unix:"):] )
+
+if __name__ == "__main__":
+    main()
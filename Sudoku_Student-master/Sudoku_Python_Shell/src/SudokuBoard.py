@@ -1,3 +1,4 @@
+import os
 import itertools
 import random
 import Constraint
@@ -14,7 +15,7 @@ class SudokuBoard:
     # Constructors
     # ==================================================================
 
-    def __init__( self, p = None, q = None, m = None, board = None, filepath = None ):
+    def __init__( self, p = None, q = None, m = None, board = None, filepath = None, text = None ):
         self.p = p
         self.q = q
         try:
@@ -28,23 +29,11 @@ class SudokuBoard:
         elif filepath != None:
             '''read from input file and generate gameboard'''
             with open(filepath) as f:
-                lines = f.readlines()
+                self.readLines(f.readlines())
 
-                try:
-                    self.p = int(float(lines[0].split()[0]))
-                    self.q = int(float(lines[0].split()[1]))
-                    self.N = self.p*self.q
-                except:
-                    self.p = 3
-                    self.q = 3
-                    self.N = 9
-
-                self.board = []
-                for i in range(1, len(lines)):
-                    tempLine = []
-                    for n in lines[i].split():
-                        tempLine.append(self.odometerToInt(n))
-                    self.board.append(tempLine)
+        elif text != None:
+            '''read a board given in the input file format'''
+            self.readLines(text.splitlines())
 
         else:
             if m == None:
@@ -53,19 +42,14 @@ class SudokuBoard:
                 self.p = 3
             if q == None:
                 self.q = 3
-            self.N = p*q
-            self.board = [[0 for j in range(self.N)] for i in range(self.N)]
-
-            while True:
-                if m <= 0:
-                    break
+            self.N = self.p*self.q
 
-                randomRow = random.randint(0, self.N-1)
-                randomCol = random.randint(0, self.N-1)
-                randomAssignment = random.randint(1, self.N)
-                if self.board[randomRow][randomCol] == 0 and self.isValidValue( randomRow, randomCol, randomAssignment ):
-                    self.board[randomRow][randomCol] = randomAssignment
-                    m -= 1
+            # Keep m cells of a random solved grid, so the board is solvable
+            solved = self.solvedGrid()
+            cells = random.sample( range(self.N*self.N), min( m, self.N*self.N ) )
+            self.board = [[0 for j in range(self.N)] for i in range(self.N)]
+            for c in cells:
+                self.board[c // self.N][c % self.N] = solved[c // self.N][c % self.N]
 
     # ==================================================================
     # String representation
@@ -74,10 +58,11 @@ class SudokuBoard:
     def __str__ ( self ):
         output = "p:" + str(self.p) + "\tq:" \
                                             + str(self.q) + "\n"
+        width = len(self.intToOdometer(self.N))
         for i in range(self.N):
             for j in range(self.N):
                 try:
-                    output += self.intToOdometer(self.board[i][j]) + " "
+                    output += self.intToOdometer(self.board[i][j]).rjust(width) + " "
                 except:
                     pass
 
@@ -86,15 +71,42 @@ class SudokuBoard:
 
             output += "\n"
             if (i+1) % self.p == 0 and i!=0 and i != (self.N - 1):
-                for k in range(self.N + self.p - 1):
+                for k in range((width+1)*self.N//2 + self.p - 1):
                     output += "- "
                 output += "\n"
         return output
 
+    # Returns the board in the same format as the input files
+    def toText ( self ):
+        output = str(self.p) + " " + str(self.q) + "\n"
+        for i in range(self.N):
+            for j in range(self.N):
+                output += self.intToOdometer(self.board[i][j]) + " "
+            output += "\n"
+        return output
+
     # ==================================================================
     # Private Helper Methods
     # ==================================================================
 
+    def readLines ( self, lines ):
+        try:
+            self.p = int(float(lines[0].split()[0]))
+            self.q = int(float(lines[0].split()[1]))
+            self.N = self.p*self.q
+        except:
+            self.p = 3
+            self.q = 3
+            self.N = 9
+
+        self.board = []
+        for i in range(1, len(lines)):
+            tempLine = []
+            for n in lines[i].split():
+                tempLine.append(self.odometerToInt(n))
+            if tempLine:
+                self.board.append(tempLine)
+
     def isValidValue ( self, row, col, value ):
         # check whether current value can be assigned to current variable
         return self.isValidColValue(col, value) and self.isValidRowValue(row, value) and self.isValidBlock(row, col, value)
@@ -117,6 +129,50 @@ class SudokuBoard:
                     return False
         return True
 
+    """
+        Builds a random complete grid without search. The base pattern puts
+        value (q*(row%p) + row//p + col) % N + 1 in each cell, which is a
+        valid solution for p x q blocks; shuffling the values, the rows
+        inside each band, the bands, the columns inside each stack and the
+        stacks keeps it valid.
+    """
+    def solvedGrid ( self, rng = random ):
+        p = self.p
+        q = self.q
+        N = self.N
+
+        values = list(range(1, N+1))
+        rng.shuffle(values)
+
+        bands = list(range(q))
+        rng.shuffle(bands)
+        rows = []
+        for b in bands:
+            inBand = [ b*p + r for r in range(p) ]
+            rng.shuffle(inBand)
+            rows.extend(inBand)
+
+        stacks = list(range(p))
+        rng.shuffle(stacks)
+        cols = []
+        for s in stacks:
+            inStack = [ s*q + c for c in range(q) ]
+            rng.shuffle(inStack)
+            cols.extend(inStack)
+
+        grid = [[ values[(q*(r % p) + r//p + c) % N] for c in cols ] for r in rows ]
+
+        if p == q and rng.random() < 0.5:
+            grid = [ list(col) for col in zip(*grid) ]
+
+        return grid
+
+    """
+        Cell values are written in base 36, one whitespace separated token
+        per cell. Values up to 35 are a single character (1-9, A-Z); larger
+        boards (36x36, 49x49, 64x64, ...) use multi-character tokens, e.g.
+        36 is "10" and 64 is "1S".
+    """
     def intToOdometer ( self, n ):
         alphabet='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
         toReturn = ''
@@ -136,3 +192,9 @@ class SudokuBoard:
 
         except:
             return 0
+
+# Returns the board files of a directory, sorted by name, or the file itself
+def listBoards ( path ):
+    if os.path.isdir( path ):
+        return [ os.path.join( path, f ) for f in sorted( os.listdir( path ) ) ]
+    return [ path ]
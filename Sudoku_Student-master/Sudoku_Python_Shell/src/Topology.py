@@ -0,0 +1,97 @@
+"""
+    Shape-only description of a p x q Sudoku: which cells belong to which
+    row, column and block, and which cells are peers of each other. It does
+    not depend on the givens, so one template is built per (p, q) and shared
+    by every ConstraintNetwork of that shape.
+
+    Cells are identified by their index in row-major order (row * N + col).
+"""
+
+class Topology:
+
+    # ==================================================================
+    # Properties
+    # ==================================================================
+    templates = dict()
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, p, q ):
+        self.p = p
+        self.q = q
+        self.N = p*q
+        N = self.N
+
+        # (row, col, block) of every cell
+        self.cells = []
+        for i in range(N):
+            for j in range(N):
+                self.cells.append( ( i, j, (i // p) * p + (j // q) ) )
+
+        # Units are ordered rows, then columns, then blocks
+        self.rows   = [[ i*N + j for j in range(N) ] for i in range(N)]
+        self.cols   = [[ i*N + j for i in range(N) ] for j in range(N)]
+        self.blocks = [[] for b in range(N)]
+        for index, cell in enumerate(self.cells):
+            self.blocks[cell[2]].append( index )
+        self.units = self.rows + self.cols + self.blocks
+
+        # Unit indices containing each cell
+        self.unitsOfCell = [[] for index in range(N*N)]
+        for u, unit in enumerate(self.units):
+            for index in unit:
+                self.unitsOfCell[index].append( u )
+
+        # Every other cell sharing at least one unit with each cell
+        self.peers = []
+        for index in range(N*N):
+            peers = set()
+            for u in self.unitsOfCell[index]:
+                peers.update( self.units[u] )
+            peers.discard( index )
+            self.peers.append( tuple( sorted( peers ) ) )
+
+        # Every (block, row or column) pair that overlaps, as the two unit
+        # indices, the overlapping cells, the rest of the block and the
+        # rest of the line
+        self.intersections = []
+        for b, block in enumerate(self.blocks):
+            rows = sorted( set( self.cells[i][0] for i in block ) )
+            cols = sorted( set( self.cells[i][1] for i in block ) )
+            for u in rows + [ N + c for c in cols ]:
+                line = self.units[u]
+                inBlock = set( block )
+                overlap = tuple( i for i in line if i in inBlock )
+                inOverlap = set( overlap )
+                blockRest = tuple( i for i in block if i not in inOverlap )
+                lineRest = tuple( i for i in line if i not in inBlock )
+                self.intersections.append( ( 2*N + b, u, overlap, blockRest, lineRest ) )
+
+        # The same as bit masks over the cell indices, for BitBoard
+        self.unitMasks = [ cellMask( unit ) for unit in self.units ]
+        self.intersectionMasks = [ ( cellMask( key[2] ), cellMask( key[3] ), cellMask( key[4] ) ) for key in self.intersections ]
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Returns the shared template for a p x q board, building it on first use
+    @staticmethod
+    def get ( p, q ):
+        key = ( p, q )
+        if key not in Topology.templates:
+            Topology.templates[key] = Topology( p, q )
+        return Topology.templates[key]
+
+    # Returns the row-major index of a cell
+    def index ( self, row, col ):
+        return row * self.N + col
+
+# Returns the bit mask with the bits of the given cell indices set
+def cellMask ( cells ):
+    mask = 0
+    for index in cells:
+        mask |= 1 << index
+    return mask
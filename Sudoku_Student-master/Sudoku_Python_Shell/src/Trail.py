@@ -22,6 +22,10 @@ class Trail:
     def __init__ ( self ):
         self.trailStack  = []
         self.trailMarker = []
+        self.maxSize     = 0
+
+        # Told through trailGrew whenever the trail reaches a new maximum size
+        self.observer    = None
 
     # ==================================================================
     # Accessors
@@ -36,6 +40,10 @@ class Trail:
     def getUndoCount ( self ):
         return Trail.numUndo
 
+    # Largest size the trail reached since the last resetMaxSize
+    def getMaxSize ( self ):
+        return self.maxSize
+
     # ==================================================================
     # Modifiers
     # ==================================================================
@@ -55,10 +63,18 @@ class Trail:
         domainCopy = Domain.Domain( [i for i in v.getValues()] )
         vPair = [v, domainCopy]
         self.trailStack.append(vPair)
+        if len(self.trailStack) > self.maxSize:
+            self.maxSize = len(self.trailStack)
+            if self.observer != None:
+                self.observer.trailGrew( self )
 
     # Pops and restores variables on the trail until the last trail marker
     def undo ( self ):
         Trail.numUndo += 1
+        self.restore()
+
+    # Like undo, but not counted as a backtrack (e.g. unwinding for a restart)
+    def restore ( self ):
         targetSize = self.trailMarker.pop() # targetSize target position on the trail to backtrack to
         size = len(self.trailStack)
         while size > targetSize:
@@ -73,3 +89,7 @@ class Trail:
     def clear ( self ):
         self.trailStack = []
         self.trailMarker = []
+
+    # Starts tracking the largest size again from the current size
+    def resetMaxSize ( self ):
+        self.maxSize = len(self.trailStack)
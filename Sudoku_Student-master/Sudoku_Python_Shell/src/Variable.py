@@ -9,6 +9,13 @@ STATIC_NAMING_COUNTER = 1
 
 class Variable:
 
+    # ==================================================================
+    # Properties
+    # ==================================================================
+
+    # Increases on every domain or assignment change, see markChanged
+    versionCounter = 0
+
     # ==================================================================
     # Constructors
     # ==================================================================
@@ -22,6 +29,9 @@ class Variable:
         self.row = row
         self.col = col
         self.block = block
+        self.version = 0
+        self.observer = None
+        self.markChanged()
         if self.size() == 1:
             self.assigned = True
             self.modified = True
@@ -81,6 +91,19 @@ class Variable:
 
     def unassign(self):
         self.assigned = False
+        self.markChanged()
+
+    """
+        Stamps the variable with a new version. Versions come from one
+        counter shared by all variables, so a variable is unchanged since
+        some point in time iff its version is not above the counter's value
+        at that time. The observer, if any, is told about every change.
+    """
+    def markChanged ( self ):
+        Variable.versionCounter += 1
+        self.version = Variable.versionCounter
+        if self.observer != None:
+            self.observer.variableChanged( self )
 
     # Assign a value to the variable
     def assignValue ( self, val ):
@@ -98,13 +121,15 @@ class Variable:
         if self.domain != d:
             self.domain = d
             self.modified = True
+            self.markChanged()
 
     # Removes a value from the domain
     def removeValueFromDomain ( self, val ):
         if not self.changeable:
             return
 
-        self.domain.remove( val )
+        if self.domain.remove( val ):
+            self.markChanged()
         self.modified = self.domain.isModified()
 
     # ==================================================================
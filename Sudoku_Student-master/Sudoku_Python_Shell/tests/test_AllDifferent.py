@@ -0,0 +1,97 @@
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "src" ) )
+
+import AllDifferent
+import Constraint
+import Trail
+import Variable
+
+"""
+    Checks AllDifferent.propagate against brute-force generalized arc
+    consistency on random small domains.
+
+    Usage: python3 -m pytest tests
+"""
+
+SEEDS = range( 200 )
+
+# Returns one all-different constraint over random domains drawn from 1..n
+def randomConstraint ( rng ):
+    n = rng.randint( 3, 6 )
+    c = Constraint.Constraint()
+    for i in range( rng.randint( 2, n ) ):
+        values = rng.sample( range( 1, n + 1 ), rng.randint( 2, n ) )
+        c.addVariable( Variable.Variable( sorted( values ), 0, i, 0 ) )
+    return c
+
+"""
+    Enumerates every assignment of distinct values.
+
+    Return: the supported domain of every variable, or None if there is no
+            such assignment
+"""
+def bruteForceGAC ( variables ):
+    supports = [ set() for x in variables ]
+    for values in itertools.product( *[ x.getValues() for x in variables ] ):
+        if len( set( values ) ) == len( values ):
+            for support, value in zip( supports, values ):
+                support.add( value )
+    if not supports[0]:
+        return None
+    return [ sorted( s ) for s in supports ]
+
+# Propagates once and compares with the brute force, returns False once inconsistent
+def checkPropagate ( alldiff, trail ):
+    before = sum( x.size() for x in alldiff.vars )
+    expected = bruteForceGAC( alldiff.vars )
+    removed, consistent = alldiff.propagate( trail )
+
+    assert consistent == ( expected != None )
+    if not consistent:
+        return False
+    assert [ sorted( x.getValues() ) for x in alldiff.vars ] == expected
+    assert removed == before - sum( x.size() for x in alldiff.vars )
+    return True
+
+def test_propagate_matches_brute_force ( ):
+    for seed in SEEDS:
+        rng = random.Random( seed )
+        c = randomConstraint( rng )
+        checkPropagate( AllDifferent.AllDifferent( c ), Trail.Trail() )
+
+def test_propagate_after_removals ( ):
+    for seed in SEEDS:
+        rng = random.Random( seed )
+        c = randomConstraint( rng )
+        alldiff = AllDifferent.AllDifferent( c )
+        trail = Trail.Trail()
+
+        # The matching of the previous call is reused, so remove values in
+        # between and check again until the constraint fails
+        while checkPropagate( alldiff, trail ):
+            unfixed = [ x for x in alldiff.vars if x.size() > 1 ]
+            if not unfixed:
+                break
+            x = rng.choice( unfixed )
+            trail.push( x )
+            x.removeValueFromDomain( rng.choice( x.getValues() ) )
+
+def test_undo_restores_domains ( ):
+    for seed in SEEDS:
+        rng = random.Random( seed )
+        c = randomConstraint( rng )
+        alldiff = AllDifferent.AllDifferent( c )
+        trail = Trail.Trail()
+        domains = [ list( x.getValues() ) for x in alldiff.vars ]
+
+        trail.placeTrailMarker()
+        alldiff.propagate( trail )
+        trail.undo()
+        assert [ list( x.getValues() ) for x in alldiff.vars ] == domains
+
+        # The stale matching must not stop the next call from being exact
+        checkPropagate( alldiff, trail )
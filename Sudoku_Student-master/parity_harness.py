@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import re
+import time
+import subprocess
+
+"""
+    Runs the Python, C++ and Java shells on the same boards and flags and
+    checks that they agree: same outcome, same solution and the same trail
+    push and backtrack counts. Any difference means the implementations do
+    not search the same tree. Wall times (including process startup) are
+    reported as ratios to the first shell.
+
+    Usage: python3 parity_harness.py BOARD_OR_DIR... [CONFIG="MRV LCV FC"]... [SHELLS=python,cpp,java] [TIMEOUT=s] [NOBUILD]
+
+    The C++ and Java shells are built with their own Makefiles first unless
+    NOBUILD is given; a shell whose build fails is left out. Only flags all
+    shells understand (MRV, MAD, LCV, FC, NOR, TOURN) should be compared.
+    The exit status is 1 if any mismatch was found.
+"""
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+sys.path.insert( 0, os.path.join( ROOT, "Sudoku_Python_Shell", "src" ) )
+import SudokuBoard
+
+# Directory, build command and run command of every shell
+SHELLS = {
+    "python" : ( "Sudoku_Python_Shell", None,       [ sys.executable, "src/Main.py" ] ),
+    "cpp"    : ( "Sudoku_Cpp_Shell",    [ "make" ], [ "bin/Sudoku" ] ),
+    "java"   : ( "Sudoku_Java_Shell",   [ "make" ], [ "java", "-jar", "bin/Sudoku.jar" ] ),
+}
+
+DEFAULT_CONFIGS = [ "MRV LCV FC", "MAD LCV NOR" ]
+
+DEFAULT_TIME_LIMIT = 600
+
+# ==================================================================
+# Running the Shells
+# ==================================================================
+
+# Builds a shell, returning an error message or None on success
+def build ( shell ):
+    directory, command, run = SHELLS[shell]
+    if command == None:
+        return None
+    try:
+        result = subprocess.run( command, cwd=os.path.join( ROOT, directory ), capture_output=True, text=True )
+    except OSError as e:
+        return str(e)
+    if result.returncode != 0:
+        lines = ( result.stdout + result.stderr ).strip().splitlines()
+        return lines[-1] if lines else "build failed"
+    return None
+
+"""
+    Parses the output of a shell's Main for one board.
+
+    Return: a dict with "solved", "solution" (the rows of the solved board
+            as lists of tokens, or None), "pushes" and "backtracks"
+"""
+def parseOutput ( output ):
+    lines = output.splitlines()
+    result = { "solved" : False, "solution" : None, "pushes" : None, "backtracks" : None }
+
+    # The input board is printed first and the solution, if any, last
+    rows = []
+    for line in lines:
+        if re.match( r"^\s*[pP]:\s*\d+\s+[qQ]:\s*\d+", line ):
+            rows = []
+            continue
+        tokens = [ t for t in line.split() if t != "|" ]
+        if tokens and all( re.match( r"^[0-9A-Z]+$", t ) for t in tokens ) and len(tokens) > 1:
+            rows.append( [ t.lstrip( "0" ) or "0" for t in tokens ] )
+
+    for line in lines:
+        if line.startswith( "Trail Pushes:" ):
+            result["pushes"] = int( line.split( ":" )[1] )
+        elif line.startswith( "Backtracks:" ):
+            result["backtracks"] = int( line.split( ":" )[1] )
+
+    if result["pushes"] != None:
+        N = len(rows[0]) if rows else 0
+        result["solved"] = True
+        result["solution"] = rows[-N:]
+    return result
+
+# Runs one shell on one board, returning the parsed output and its wall time
+def runShell ( shell, board, flags, timeLimit ):
+    directory, command, run = SHELLS[shell]
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run( run + flags.split() + [ os.path.abspath( board ) ],
+                                    cwd=os.path.join( ROOT, directory ), capture_output=True,
+                                    text=True, timeout=timeLimit )
+        result = parseOutput( completed.stdout )
+        result["status"] = "solved" if result["solved"] else "unsolved"
+    except subprocess.TimeoutExpired:
+        result = { "solved" : False, "solution" : None, "pushes" : None, "backtracks" : None, "status" : "timeout" }
+    result["time"] = time.perf_counter() - start
+    return result
+
+# Returns the names of the fields in which two results differ
+def compare ( a, b ):
+    return [ key for key in [ "status", "solution", "pushes", "backtracks" ] if a[key] != b[key] ]
+
+# ==================================================================
+# Reporting
+# ==================================================================
+
+# Describes how one field differs between two results
+def describe ( field, a, b ):
+    if field == "solution":
+        return "solution differs"
+    return "{} {} != {}".format( field, a[field], b[field] )
+
+def main ( ):
+    paths = []
+    configs = []
+    shells = list( SHELLS )
+    timeLimit = DEFAULT_TIME_LIMIT
+    buildShells = True
+
+    for arg in sys.argv[1:]:
+        if arg.startswith("CONFIG="):
+            configs.append( arg[len("CONFIG="):] )
+        elif arg.startswith("SHELLS="):
+            shells = [ s for s in arg[len("SHELLS="):].split( "," ) if s != "" ]
+        elif arg.startswith("TIMEOUT="):
+            timeLimit = float( arg[len("TIMEOUT="):] )
+        elif arg == "NOBUILD":
+            buildShells = False
+        else:
+            paths.append( arg )
+
+    if not paths:
+        print( "Usage: parity_harness.py BOARD_OR_DIR... [CONFIG=\"flags\"]... [SHELLS=python,cpp,java] [TIMEOUT=s] [NOBUILD]" )
+        return 2
+
+    if not configs:
+        configs = DEFAULT_CONFIGS
+
+    if buildShells:
+        for shell in list( shells ):
+            error = build( shell )
+            if error != None:
+                print( "Skipping " + shell + ": " + str(error) )
+                shells.remove( shell )
+
+    if len(shells) < 2:
+        print( "Need at least two shells to compare" )
+        return 2
+
+    boards = [ b for path in paths for b in SudokuBoard.listBoards( path ) ]
+    mismatches = 0
+
+    for flags in configs:
+        totals = { shell : 0.0 for shell in shells }
+        for board in boards:
+            results = { shell : runShell( shell, board, flags, timeLimit ) for shell in shells }
+            for shell in shells:
+                totals[shell] += results[shell]["time"]
+
+            reference = results[shells[0]]
+            for shell in shells[1:]:
+                fields = compare( reference, results[shell] )
+                if fields:
+                    mismatches += 1
+                    print( "MISMATCH {} [{}] {} vs {}: {}".format(
+                        os.path.basename( board ), flags, shells[0], shell,
+                        ", ".join( describe( f, reference, results[shell] ) for f in fields ) ) )
+
+        print( "{:<16} {:>6} boards  ".format( flags, len(boards) ) + "  ".join(
+            "{} {:.2f}s (x{:.2f})".format( shell, totals[shell], totals[shell] / totals[shells[0]] if totals[shells[0]] > 0 else 0 )
+            for shell in shells ) )
+
+    print( "Mismatches: " + str(mismatches) )
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit( main() )